@@ -3,6 +3,7 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from app.config import config
 from app.utils.db_connection import db_connection
+from app.utils.pagination import ensure_list_indexes
 def create_app(config_name='development'):
     """Application factory"""
     app = Flask(__name__)
@@ -47,6 +48,14 @@ def create_app(config_name='development'):
     # Initialize database connection
     with app.app_context():
         db_connection.connect()
+        try:
+            ensure_list_indexes(db_connection.get_db())
+        except Exception as e:
+            print(f"⚠️  List index creation error: {e}")
+
+    # Map a network snapshot already written by another worker (no ArangoDB queries)
+    from app.utils.network import network
+    network.preload()
     
     from app.routes.route_routes import route_bp
     from app.routes.auth_routes import auth_bp
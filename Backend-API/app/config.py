@@ -14,6 +14,44 @@ class Config:
     ARANGO_PASSWORD = os.getenv('ARANGO_PASSWORD', '')
     ARANGO_DATABASE = os.getenv('ARANGO_DATABASE', 'bus_management_hcm')
     
+    # Journey engine: treat `connects` as one-way edges (default mirrors ANY traversal)
+    JOURNEY_DIRECTED_EDGES = os.getenv('JOURNEY_DIRECTED_EDGES', 'False') == 'True'
+    # Travel-time matrix: worker processes (0 = compute in the request thread, the default;
+    # each web worker gets its own pool, so size it for workers x pool processes)
+    JOURNEY_MATRIX_WORKERS = int(os.getenv('JOURNEY_MATRIX_WORKERS', 0))
+    JOURNEY_MATRIX_MAX_CELLS = int(os.getenv('JOURNEY_MATRIX_MAX_CELLS', 1000000))
+    # Alternative journeys: max k, and minutes added per transfer when ranking
+    JOURNEY_MAX_ALTERNATIVES = int(os.getenv('JOURNEY_MAX_ALTERNATIVES', 5))
+    JOURNEY_TRANSFER_PENALTY_MIN = float(os.getenv('JOURNEY_TRANSFER_PENALTY_MIN', 5))
+    # Walking speed used when snapping coordinates to stations
+    JOURNEY_WALK_SPEED_KMH = float(os.getenv('JOURNEY_WALK_SPEED_KMH', 5))
+    # Generated walking transfers: max straight-line radius and street detour factor
+    JOURNEY_FOOTPATH_RADIUS_KM = float(os.getenv('JOURNEY_FOOTPATH_RADIUS_KM', 0.4))
+    JOURNEY_WALK_DETOUR = float(os.getenv('JOURNEY_WALK_DETOUR', 1.3))
+    # Precomputed hub labels for point-to-point queries (memory-mapped .npy files)
+    JOURNEY_HUB_LABELS = os.getenv('JOURNEY_HUB_LABELS', 'True') == 'True'
+    JOURNEY_HUB_LABEL_DIR = os.getenv('JOURNEY_HUB_LABEL_DIR', os.path.join('instance', 'hub_labels'))
+    JOURNEY_HUB_LABEL_METRICS = tuple(
+        m.strip() for m in os.getenv('JOURNEY_HUB_LABEL_METRICS', 'duration').split(',') if m.strip()
+    )
+    # Graphs with more stations than this only use labels built offline (scripts/build_hub_labels.py);
+    # raise it to let the API build them in the background (0 = never build at runtime)
+    JOURNEY_HUB_LABEL_BUILD_MAX_STATIONS = int(os.getenv('JOURNEY_HUB_LABEL_BUILD_MAX_STATIONS', 5000))
+    # Network snapshots shared by worker processes (memory-mapped graph arrays, needs Redis)
+    JOURNEY_NETWORK_SNAPSHOTS = os.getenv('JOURNEY_NETWORK_SNAPSHOTS', 'True') == 'True'
+    JOURNEY_NETWORK_DIR = os.getenv('JOURNEY_NETWORK_DIR', os.path.join('instance', 'network'))
+    # How often a worker compares its snapshot with ArangoDB collection revisions (catches writes
+    # made outside the API, e.g. the seed scripts; 0 = only on load)
+    JOURNEY_NETWORK_CHECK_SECONDS = int(os.getenv('JOURNEY_NETWORK_CHECK_SECONDS', 30))
+    # Journey result cache in Redis (keys carry the network version, so no TTL tuning for freshness)
+    JOURNEY_CACHE = os.getenv('JOURNEY_CACHE', 'True') == 'True'
+    JOURNEY_CACHE_TTL = int(os.getenv('JOURNEY_CACHE_TTL', 600))
+    # OD pairs tracked per endpoint in the cache stats (least requested are dropped past this)
+    JOURNEY_CACHE_STATS_MAX_PAIRS = int(os.getenv('JOURNEY_CACHE_STATS_MAX_PAIRS', 10000))
+    
+    # Bulk station import: documents per ArangoDB bulk insert
+    STATION_IMPORT_BATCH_SIZE = int(os.getenv('STATION_IMPORT_BATCH_SIZE', 500))
+    
     # Flask Configuration
     DEBUG = os.getenv('DEBUG', 'True') == 'True'
     PORT = int(os.getenv('PORT', 5000))
@@ -55,6 +55,33 @@ def validate_station_data(data):
         return False, "Invalid station status"
     
     return True, None
+
+def validate_station_update(data):
+    """Validate a partial station update (only the fields update_station accepts)"""
+    allowed_fields = ['name', 'address', 'location', 'type', 'status', 'capacity', 'facilities']
+    
+    if not isinstance(data, dict) or not data:
+        return False, "No fields to update"
+    
+    for field in data:
+        if field not in allowed_fields:
+            return False, f"Field cannot be updated: {field}"
+    
+    if 'address' in data and not isinstance(data['address'], dict):
+        return False, "Address must be an object"
+    
+    if 'location' in data and not isinstance(data['location'], dict):
+        return False, "Location must contain latitude and longitude"
+    if 'location' in data and not all(k in data['location'] for k in ['latitude', 'longitude']):
+        return False, "Location must contain latitude and longitude"
+    
+    if 'type' in data and data['type'] not in ['terminal', 'intermediate', 'stop']:
+        return False, "Invalid station type"
+    
+    if 'status' in data and data['status'] not in ['active', 'maintenance', 'inactive']:
+        return False, "Invalid station status"
+    
+    return True, None
 class Station:
     def __init__(self, station_id, name, address, location, 
                  type="intermediate", status="active", facilities=None, capacity=10):
@@ -1,23 +1,53 @@
 from flask import Blueprint, request, jsonify
-from app.utils.db_connection import db_connection
 from flask_jwt_extended import jwt_required
-import math
+from app.utils.network import network
+from app.utils.journey_cache import journey_cache, CACHED_ENDPOINTS
+from app.utils.station_graph import walk_cost, constraint_mask, METRICS, ALGORITHMS
+from app.utils.travel_matrix import travel_matrix
+from app.utils.footpaths import rebuild_footpaths
+from app.utils.route_index import FARE_CATEGORIES
+from app.utils.timetable import parse_time, format_time, DAYS, MAX_TRANSFERS, PROFILE_WINDOW_MIN, ARRIVE_BY_WINDOW_MIN
+from app.config import Config
 
 journey_bp = Blueprint('journey', __name__, url_prefix='/api/journey')
 
-def calculate_distance(lat1, lng1, lat2, lng2):
-    """Calculate distance between two points using Haversine formula (in meters)"""
-    R = 6371000  # Earth radius in meters
-    
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lng = math.radians(lng2 - lng1)
-    
-    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    
-    return R * c
+TIMETABLE_MODES = ('depart_at', 'arrive_by', 'range')
+
+def parse_constraints(data):
+    """Station constraint mask from wheelchair_accessible_only / required_facilities / avoid_status"""
+    required = data.get('required_facilities') or []
+    avoid = data.get('avoid_status') or []
+    if isinstance(required, str):
+        required = required.split(',')
+    if isinstance(avoid, str):
+        avoid = avoid.split(',')
+    required = [f.strip() for f in required if f.strip()]
+    if data.get('wheelchair_accessible_only'):
+        required.append('wheelchair_accessible')
+    return constraint_mask(required, [a.strip() for a in avoid if a.strip()])
+
+def build_journey(graph, index, path, transfer_penalty, **extra):
+    """Format a graph path as a journey: legs labelled with routes, transfers and score"""
+    journey = graph.path_payload(path)
+    vertices = journey['vertices']
+    segments, transfers = index.label_path(
+        vertices, journey['edges'], allow_reverse=not graph.directed
+    )
+    return {
+        "type": "graph_path",
+        **extra,
+        "expanded_nodes": path['expanded'],
+        "vertices": vertices,
+        "edges": journey['edges'],
+        "total_distance": journey['total_distance'],
+        "total_duration": journey['total_duration'],
+        "stops": len(vertices) - 1, # Số trạm dừng = Tổng đỉnh - 1 (đỉnh đầu)
+        "routes": segments,
+        "transfers": transfers,
+        "transfer_count": len(transfers),
+        "score": journey['total_duration'] + transfer_penalty * len(transfers)
+    }
+
 @journey_bp.route('/shortest-path', methods=['POST'])
 @jwt_required()
 def find_shortest_path():
@@ -32,111 +62,101 @@ def find_shortest_path():
         if from_station_id == to_station_id:
              return jsonify({"success": False, "error": "Điểm đi và đến trùng nhau"}), 400
 
-        db = db_connection.get_db()
+        metric = data.get('metric', 'duration')
+        if metric not in METRICS:
+            return jsonify({"success": False, "error": f"metric phải là một trong {list(METRICS)}"}), 400
+
+        algorithm = data.get('algorithm') or request.args.get('algorithm', 'auto')
+        if algorithm not in ALGORITHMS:
+            return jsonify({"success": False, "error": f"algorithm phải là một trong {list(ALGORITHMS)}"}), 400
+
+        alternatives = int(data.get('alternatives', 1))
+        if not 1 <= alternatives <= Config.JOURNEY_MAX_ALTERNATIVES:
+            return jsonify({"success": False, "error": f"alternatives phải từ 1 đến {Config.JOURNEY_MAX_ALTERNATIVES}"}), 400
+        transfer_penalty = float(data.get('transfer_penalty', Config.JOURNEY_TRANSFER_PENALTY_MIN))
+
+        try:
+            mask = parse_constraints(data)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        # Một snapshot cho cả request: graph và route index luôn cùng version
+        snapshot = network.get()
+        graph = snapshot.graph
+
+        # Cache theo version của snapshot: network.invalidate() làm mọi key cũ hết hiệu lực
+        cache_key = journey_cache.key(snapshot.version, 'shortest-path', from_station_id, to_station_id, {
+            "metric": metric,
+            "algorithm": algorithm,
+            "alternatives": alternatives,
+            "transfer_penalty": transfer_penalty,
+            "mask": mask
+        })
+        cached = journey_cache.get(cache_key, 'shortest-path', from_station_id, to_station_id)
+        if cached is not None:
+            return jsonify({
+                "success": True,
+                "data": cached
+            }), 200
 
-        # --- BƯỚC 1: Lấy ID hệ thống của trạm ---
+        # --- BƯỚC 1: Lấy node của trạm trong graph (không cần truy vấn DB) ---
         print(f"🔍 Đang tìm ID cho: {from_station_id} -> {to_station_id}")
         
-        aql_get_ids = """
-        LET start = (FOR s IN stations FILTER s.station_id == @from_id LIMIT 1 RETURN s)
-        LET end = (FOR s IN stations FILTER s.station_id == @to_id LIMIT 1 RETURN s)
-        RETURN { 
-            start: start[0], 
-            end: end[0] 
-        }
-        """
-        
-        id_result = list(db.AQLQuery(aql_get_ids, bindVars={
-            'from_id': from_station_id, 
-            'to_id': to_station_id
-        }, rawResults=True))
+        source = graph.node(from_station_id)
+        target = graph.node(to_station_id)
         
-        if not id_result or not id_result[0].get('start') or not id_result[0].get('end'):
+        if source is None or target is None:
             return jsonify({"success": False, "error": "Không tìm thấy mã trạm trong hệ thống"}), 404
-            
-        start_node_id = id_result[0]['start']['_id']
-        end_node_id = id_result[0]['end']['_id']
-        start_name = id_result[0]['start']['name']
-        end_name = id_result[0]['end']['name']
 
-        print(f"📍 Bắt đầu tìm đường: {start_name} ({start_node_id}) ===> {end_name} ({end_node_id})")
+        if not graph.allowed(source, mask) or not graph.allowed(target, mask):
+            return jsonify({"success": False, "error": "Trạm đi hoặc trạm đến không thỏa điều kiện lọc"}), 404
+            
+        start_name = graph.stations[source]['name']
+        end_name = graph.stations[target]['name']
 
-        # --- BƯỚC 2: Tìm đường bằng TRAVERSAL (Thay vì Shortest Path) ---
-        # Giải thích:
-        # 1..50: Tìm trong phạm vi 1 đến 50 trạm dừng (đủ cho nội thành)
-        # ANY: Đi bất chấp chiều mũi tên (coi như đường 2 chiều)
-        # OPTIONS bfs: true -> Đảm bảo tìm đường ít trạm nhất trước
-        
-        aql_traversal = """
-        FOR v, e, p IN 1..50 ANY @start_node connects
-            OPTIONS {bfs: true, uniqueVertices: 'global'}
-            FILTER v._id == @end_node
-            LIMIT 1
-            RETURN {
-                vertices: p.vertices,
-                edges: p.edges,
-                total_distance: SUM(p.edges[*].distance),
-                total_duration: SUM(p.edges[*].duration),
-                stops: LENGTH(p.edges)
-            }
-        """
+        print(f"📍 Bắt đầu tìm đường: {start_name} ===> {end_name} (metric: {metric}, {algorithm})")
 
-        path_result = list(db.AQLQuery(aql_traversal, bindVars={
-            'start_node': start_node_id,
-            'end_node': end_node_id
-        }, rawResults=True))
+        # --- BƯỚC 2: Dijkstra / A* trên graph trong bộ nhớ (CSR) ---
+        # Trọng số theo `duration` (phút) hoặc `distance` (mét) của cạnh connects,
+        # nên kết quả là đường nhanh/ngắn nhất chứ không phải đường ít trạm nhất.
+        # A*: heuristic = khoảng cách đường chim bay tới trạm đích (haversine vector hóa).
+        # auto: dùng hub labels tính sẵn (file mmap) nếu đã có, ngược lại A*.
+        # Điều kiện lọc (xe lăn, tiện ích, trạng thái) = 1 phép AND bit trên mảng
+        # flags của graph mỗi lần mở rộng node, không truy vấn lại DB.
+        # bidirectional: Dijkstra hai chiều (cạnh vào qua CSR ngược), dừng khi hai
+        # frontier gặp nhau -> so sánh với các mode khác qua expanded_nodes.
+        # alternatives > 1: Yen lấy nhiều ứng viên hơn k, sau đó xếp hạng lại
+        # theo duration + phạt mỗi lần chuyển tuyến.
+        if alternatives > 1:
+            paths = graph.k_shortest_paths(source, target, alternatives * 3, metric, mask)
+        else:
+            path = graph.shortest_path(source, target, metric, algorithm, mask)
+            paths = [path] if path else []
+            if path:
+                algorithm = path['algorithm']
 
         # --- BƯỚC 3: Kiểm tra kết quả ---
-        if not path_result:
+        if not paths:
             print("❌ Không tìm thấy đường nối giữa 2 trạm này.")
             return jsonify({
                 "success": False, 
                 "error": f"Không có tuyến xe kết nối từ {start_name} đến {end_name}"
             }), 404
-            
-        journey = path_result[0]
-        vertices = journey.get('vertices') or []
-        
-        print(f"✅ Đã tìm thấy đường! Qua {len(vertices)} trạm.")
-
-        # --- BƯỚC 4: Lấy thông tin Tuyến xe (Route Info) ---
-        # Phần này giúp hiển thị Badge "Tuyến 01" trên UI
-        routes_found = []
-        
-        # Chỉ tìm tuyến nếu có ít nhất 2 trạm (có cạnh nối)
-        if len(vertices) >= 2:
-            try:
-                # Lấy 2 trạm đầu tiên để xác định tuyến
-                v1 = vertices[0]['_id']
-                v2 = vertices[1]['_id']
-                
-                aql_route = """
-                FOR r IN routes
-                    LET s1 = (FOR s IN ANY r serves FILTER s._id == @v1 LIMIT 1 RETURN 1)
-                    LET s2 = (FOR s IN ANY r serves FILTER s._id == @v2 LIMIT 1 RETURN 1)
-                    FILTER LENGTH(s1) > 0 AND LENGTH(s2) > 0
-                    LIMIT 1
-                    RETURN { 
-                        route_code: r.route_code, 
-                        route_name: r.route_name 
-                    }
-                """
-                route_res = list(db.AQLQuery(aql_route, bindVars={'v1': v1, 'v2': v2}, rawResults=True))
-                if route_res:
-                    routes_found.append({"route": route_res[0]})
-            except Exception as e:
-                print(f"⚠️ Không xác định được tên tuyến: {e}")
 
-        # Chuẩn hóa dữ liệu trả về
-        formatted_result = [{
-            "type": "graph_path",
-            "vertices": vertices,
-            "edges": journey.get('edges') or [],
-            "total_distance": journey.get('total_distance') or 0,
-            "total_duration": journey.get('total_duration') or 0,
-            "stops": len(vertices) - 1, # Số trạm dừng = Tổng đỉnh - 1 (đỉnh đầu)
-            "routes": routes_found
-        }]
+        # --- BƯỚC 4: Gắn tuyến xe cho từng chặng + tính điểm ---
+        index = snapshot.index
+        if alternatives > 1:
+            algorithm = 'yen'
+        formatted_result = [
+            build_journey(graph, index, path, transfer_penalty, metric=metric, algorithm=algorithm)
+            for path in paths
+        ]
+        if alternatives > 1:
+            formatted_result.sort(key=lambda j: j['score'])
+            formatted_result = formatted_result[:alternatives]
+        
+        print(f"✅ Đã tìm thấy {len(formatted_result)} hành trình.")
+        journey_cache.put(cache_key, formatted_result)
 
         return jsonify({
             "success": True,
@@ -163,55 +183,106 @@ def find_routes_between_stations():
                 "error": "from_station_id and to_station_id are required"
             }), 400
         
-        db = db_connection.get_db()
+        # Inverted stop index: giao 2 danh sách (route, stop_order, arrival_offset)
+        # của 2 trạm rồi cắt dãy trạm của tuyến, không cần traverse serves.
+        index = network.get().index
+        cache_key = journey_cache.key(index.version, 'routes-between', from_station, to_station)
+        routes = journey_cache.get(cache_key, 'routes-between', from_station, to_station)
+        if routes is None:
+            routes = index.routes_between(from_station, to_station)
+            journey_cache.put(cache_key, routes)
         
-        aql = """
-        FOR route IN routes
-            LET from_serves = FIRST(
-                FOR v, e IN OUTBOUND route serves
-                    FILTER v.station_id == @from_station
-                    RETURN e
-            )
-            LET to_serves = FIRST(
-                FOR v, e IN OUTBOUND route serves
-                    FILTER v.station_id == @to_station
-                    RETURN e
-            )
-            FILTER from_serves != null AND to_serves != null
-            FILTER from_serves.stop_order < to_serves.stop_order
-            
-            LET stops_between = (
-                FOR v, e IN OUTBOUND route serves
-                    FILTER e.stop_order >= from_serves.stop_order
-                    FILTER e.stop_order <= to_serves.stop_order
-                    SORT e.stop_order
-                    RETURN {
-                        station: v,
-                        stop_order: e.stop_order
-                    }
-            )
-            
-            RETURN {
-                route: route,
-                from_stop_order: from_serves.stop_order,
-                to_stop_order: to_serves.stop_order,
-                stops: LENGTH(stops_between),
-                stops_details: stops_between
-            }
-        """
+        return jsonify({
+            "success": True,
+            "count": len(routes),
+            "index_version": index.version,
+            "data": routes
+        }), 200
         
-        bind_vars = {
-            'from_station': from_station,
-            'to_station': to_station
-        }
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@journey_bp.route('/fare-aware', methods=['POST'])
+@jwt_required()
+def find_fare_aware_journeys():
+    """Pareto-optimal journeys over duration, transfers and total fare for a rider category"""
+    try:
+        data = request.get_json()
+        from_station = data.get('from_station_id')
+        to_station = data.get('to_station_id')
+        category = data.get('rider_category', 'adult')
+        
+        if not from_station or not to_station:
+            return jsonify({
+                "success": False,
+                "error": "from_station_id and to_station_id are required"
+            }), 400
+        
+        if category not in FARE_CATEGORIES:
+            return jsonify({
+                "success": False,
+                "error": f"rider_category must be one of {list(FARE_CATEGORIES)}"
+            }), 400
+        
+        max_transfers = int(data.get('max_transfers', MAX_TRANSFERS))
+        if not 0 <= max_transfers <= 2 * MAX_TRANSFERS:
+            return jsonify({
+                "success": False,
+                "error": f"max_transfers must be between 0 and {2 * MAX_TRANSFERS}"
+            }), 400
         
-        result = db.AQLQuery(aql, bindVars=bind_vars, rawResults=True)
-        routes = list(result)
+        # McRAPTOR theo tuyến: mỗi vòng thêm một lần lên xe, nhãn (thời gian, giá vé)
+        # bị loại khi đã có nhãn tốt hơn tại trạm đó hoặc tại trạm đích
+        index = network.get().index
+        journeys = index.fare_journeys(from_station, to_station, category, max_transfers)
+        if not journeys:
+            return jsonify({
+                "success": False,
+                "error": f"No route connects {from_station} and {to_station} within {max_transfers} transfers"
+            }), 404
         
         return jsonify({
             "success": True,
-            "count": len(routes),
-            "data": routes
+            "count": len(journeys),
+            "index_version": index.version,
+            "rider_category": category,
+            "data": journeys
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@journey_bp.route('/cache/stats', methods=['GET'])
+@jwt_required()
+def get_journey_cache_stats():
+    """Journey cache hit rates per endpoint, overall and for the most requested OD pairs"""
+    try:
+        limit = request.args.get('limit', 20, type=int)
+        # ?endpoint=shortest-path|routes-between để chỉ xem một endpoint
+        endpoint = request.args.get('endpoint')
+        if endpoint is not None and endpoint not in CACHED_ENDPOINTS:
+            return jsonify({
+                "success": False,
+                "error": f"endpoint must be one of {list(CACHED_ENDPOINTS)}"
+            }), 400
+        endpoints = [endpoint] if endpoint else CACHED_ENDPOINTS
+        stats = {name: journey_cache.stats(name, limit) for name in endpoints}
+        if None in stats.values():
+            return jsonify({
+                "success": False,
+                "error": "Redis is not connected"
+            }), 503
+        
+        return jsonify({
+            "success": True,
+            "network_version": network.current_version(),
+            "data": stats
         }), 200
         
     except Exception as e:
@@ -223,39 +294,35 @@ def find_routes_between_stations():
 @journey_bp.route('/nearby-stations', methods=['GET'])
 @jwt_required()
 def find_nearby_stations():
-    """Find stations near a location"""
+    """Find stations near a location (radius and/or k-nearest)"""
     try:
+        if request.args.get('latitude') is None or request.args.get('longitude') is None:
+            return jsonify({
+                "success": False,
+                "error": "latitude and longitude are required"
+            }), 400
+        
         lat = float(request.args.get('latitude'))
         lng = float(request.args.get('longitude'))
-        radius = float(request.args.get('radius', 2))  # km
-        
-        db = db_connection.get_db()
-        
-        # Simple distance calculation (can be improved with proper geo queries)
-        aql = """
-        FOR station IN stations
-            LET distance = DISTANCE(
-                station.location.latitude,
-                station.location.longitude,
-                @lat,
-                @lng
-            ) / 1000
-            FILTER distance <= @radius
-            SORT distance
-            RETURN {
-                station: station,
-                distance: distance
-            }
-        """
+        k = request.args.get('k', type=int)
+        limit = request.args.get('limit', type=int)
+        radius = request.args.get('radius', type=float)  # km
         
-        bind_vars = {
-            'lat': lat,
-            'lng': lng,
-            'radius': radius
-        }
+        graph = network.get().graph
+        
+        # Grid index trên mảng tọa độ: chỉ tính khoảng cách cho các ô lưới
+        # giao với bán kính, không quét toàn bộ collection stations.
+        if k:
+            ids, distances = graph.spatial_index.nearest(lat, lng, k, max_radius_km=radius)
+        else:
+            ids, distances = graph.spatial_index.within(
+                lat, lng, radius if radius is not None else 2, limit=limit
+            )
         
-        result = db.AQLQuery(aql, bindVars=bind_vars, rawResults=True)
-        stations = list(result)
+        stations = [{
+            "station": graph.stations[i],
+            "distance": d
+        } for i, d in zip(ids.tolist(), distances.tolist())]
         
         return jsonify({
             "success": True,
@@ -267,4 +334,402 @@ def find_nearby_stations():
         return jsonify({
             "success": False,
             "error": str(e)
-        }), 500
\ No newline at end of file
+        }), 500
+@journey_bp.route('/matrix', methods=['POST'])
+@jwt_required()
+def get_travel_matrix():
+    """Many-to-many travel cost matrix between station lists"""
+    try:
+        data = request.get_json()
+        origins = data.get('origins') or []
+        destinations = data.get('destinations') or []
+        metric = data.get('metric', 'duration')
+        
+        if not origins or not destinations:
+            return jsonify({
+                "success": False,
+                "error": "origins and destinations are required"
+            }), 400
+        
+        if metric not in METRICS:
+            return jsonify({
+                "success": False,
+                "error": f"metric must be one of {list(METRICS)}"
+            }), 400
+        
+        if len(origins) * len(destinations) > Config.JOURNEY_MATRIX_MAX_CELLS:
+            return jsonify({
+                "success": False,
+                "error": f"Matrix too large (max {Config.JOURNEY_MATRIX_MAX_CELLS} cells)"
+            }), 400
+        
+        graph = network.get().graph
+        
+        unknown = [s for s in set(origins) | set(destinations) if graph.node(s) is None]
+        if unknown:
+            return jsonify({
+                "success": False,
+                "error": "Station not found",
+                "unknown_stations": sorted(unknown)
+            }), 404
+        
+        # One-to-many Dijkstra per origin, chia cho process pool
+        rows = travel_matrix.compute(
+            graph,
+            [graph.node(s) for s in origins],
+            [graph.node(s) for s in destinations],
+            metric
+        )
+        
+        # Compact payload: ma trận phẳng theo hàng, null = không có đường đi
+        return jsonify({
+            "success": True,
+            "data": {
+                "metric": metric,
+                "origins": origins,
+                "destinations": destinations,
+                "shape": [len(origins), len(destinations)],
+                "values": [v for row in rows for v in row]
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@journey_bp.route('/isochrone', methods=['POST'])
+@jwt_required()
+def get_isochrone():
+    """Stations reachable from an origin within a time budget"""
+    try:
+        data = request.get_json()
+        budget = data.get('budget')
+        
+        if budget is None or float(budget) <= 0:
+            return jsonify({
+                "success": False,
+                "error": "budget (minutes) is required"
+            }), 400
+        budget = float(budget)
+        departure = parse_time(data.get('departure_time'))
+        
+        graph = network.get().graph
+        
+        # Bulk mode: nhiều trạm gốc một lần (dashboard độ phủ chạy hằng đêm)
+        if data.get('station_ids'):
+            station_ids = data['station_ids']
+            unknown = [s for s in station_ids if graph.node(s) is None]
+            if unknown:
+                return jsonify({
+                    "success": False,
+                    "error": "Station not found",
+                    "unknown_stations": unknown
+                }), 404
+            
+            results = travel_matrix.reachable(graph, [graph.node(s) for s in station_ids], budget)
+            return jsonify({
+                "success": True,
+                "count": len(results),
+                "data": [{
+                    "station_id": station_id,
+                    "count": len(costs),
+                    "reachable": {graph.stations[u]['station_id']: c for u, c in costs.items()}
+                } for station_id, costs in zip(station_ids, results)]
+            }), 200
+        
+        # Điểm gốc: station_id, hoặc tọa độ được gắn vào trạm gần nhất
+        snapped = None
+        if data.get('station_id'):
+            source = graph.node(data['station_id'])
+        elif data.get('latitude') is not None and data.get('longitude') is not None:
+            snap_radius = float(data.get('snap_radius', 1))  # km
+            ids, distances = graph.spatial_index.nearest(
+                float(data['latitude']), float(data['longitude']), 1, max_radius_km=snap_radius
+            )
+            source = int(ids[0]) if len(ids) else None
+            if source is not None:
+                walk_minutes = float(distances[0]) / Config.JOURNEY_WALK_SPEED_KMH * 60
+                snapped = {"distance": float(distances[0]), "walk_minutes": walk_minutes}
+        else:
+            return jsonify({
+                "success": False,
+                "error": "station_id, station_ids or latitude/longitude is required"
+            }), 400
+        
+        if source is None:
+            return jsonify({
+                "success": False,
+                "error": "Station not found"
+            }), 404
+        
+        # Thời gian đi bộ tới trạm được trừ vào ngân sách
+        walk = snapped['walk_minutes'] if snapped else 0
+        costs = graph.reachable(source, budget - walk) if budget > walk else {}
+        
+        stations = [{
+            "station": graph.stations[u],
+            "travel_time": walk + c,
+            "arrival_time": format_time(departure + walk + c)
+        } for u, c in sorted(costs.items(), key=lambda item: item[1])]
+        
+        return jsonify({
+            "success": True,
+            "data": {
+                "origin": graph.stations[source],
+                "snapped": snapped,
+                "budget": budget,
+                "departure_time": format_time(departure),
+                "count": len(stations),
+                "stations": stations
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@journey_bp.route('/timetable', methods=['POST'])
+@jwt_required()
+def find_timetable_journey():
+    """Schedule-based journeys: earliest arrival for 'depart at T' (default),
+    latest departures for 'arrive by T', or every best journey in a departure
+    window ('range'). The last two return the Pareto set from one profile scan.
+    """
+    try:
+        data = request.get_json()
+        from_station = data.get('from_station_id')
+        to_station = data.get('to_station_id')
+        day = data.get('day') or None
+        mode = data.get('mode', 'depart_at')
+        
+        if not from_station or not to_station:
+            return jsonify({
+                "success": False,
+                "error": "from_station_id and to_station_id are required"
+            }), 400
+        
+        if day is not None and day not in DAYS:
+            return jsonify({
+                "success": False,
+                "error": f"day must be one of {list(DAYS)}"
+            }), 400
+        
+        if mode not in TIMETABLE_MODES:
+            return jsonify({
+                "success": False,
+                "error": f"mode must be one of {list(TIMETABLE_MODES)}"
+            }), 400
+        
+        max_transfers = int(data.get('max_transfers', MAX_TRANSFERS))
+        if not 0 <= max_transfers <= 2 * MAX_TRANSFERS:
+            return jsonify({
+                "success": False,
+                "error": f"max_transfers must be between 0 and {2 * MAX_TRANSFERS}"
+            }), 400
+        
+        table = network.get().timetable(day)
+        
+        source = table.stop(from_station)
+        target = table.stop(to_station)
+        if source is None or target is None:
+            return jsonify({
+                "success": False,
+                "error": "Station is not served by any route"
+            }), 404
+        
+        if mode == 'depart_at':
+            depart = parse_time(data.get('departure_time'))
+            # Connection Scan trên mảng kết nối (trip, trạm đi, trạm đến, giờ đi, giờ đến)
+            journey = table.earliest_arrival(source, target, depart)
+            if journey is None:
+                return jsonify({
+                    "success": False,
+                    "error": f"No trip reaches {to_station} after {format_time(depart)} on {table.day}"
+                }), 404
+            
+            return jsonify({
+                "success": True,
+                "data": {
+                    "day": table.day,
+                    "timetable_version": table.version,
+                    **journey
+                }
+            }), 200
+        
+        if mode == 'arrive_by':
+            arrive_by = parse_time(data.get('arrival_time'))
+            window = {
+                "departure_from": parse_time(data['departure_from']) if data.get('departure_from')
+                else max(arrive_by - ARRIVE_BY_WINDOW_MIN, 0),
+                "arrive_by": arrive_by
+            }
+            journeys = table.profile(source, target, window['departure_from'],
+                                     arrive_by=arrive_by, max_transfers=max_transfers)
+        else:
+            depart_from = parse_time(data.get('departure_from'))
+            window = {
+                "departure_from": depart_from,
+                "departure_to": parse_time(data['departure_to']) if data.get('departure_to')
+                else depart_from + PROFILE_WINDOW_MIN
+            }
+            if window['departure_to'] < depart_from:
+                return jsonify({
+                    "success": False,
+                    "error": "departure_to must not be before departure_from"
+                }), 400
+            journeys = table.profile(source, target, depart_from, window['departure_to'],
+                                     max_transfers=max_transfers)
+        
+        # Tập Pareto (giờ đi muộn hơn, giờ đến sớm hơn, ít chuyển tuyến hơn) từ một lần quét
+        if not journeys:
+            return jsonify({
+                "success": False,
+                "error": f"No trip connects {from_station} and {to_station} in the requested window on {table.day}"
+            }), 404
+        
+        return jsonify({
+            "success": True,
+            "data": {
+                "day": table.day,
+                "timetable_version": table.version,
+                "mode": mode,
+                **{key: format_time(value) for key, value in window.items()},
+                "count": len(journeys),
+                "journeys": journeys
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@journey_bp.route('/plan', methods=['POST'])
+@jwt_required()
+def plan_journey():
+    """Coordinate-to-coordinate journey: walk to a stop, ride, walk to the destination"""
+    try:
+        data = request.get_json()
+        origin = data.get('origin') or {}
+        destination = data.get('destination') or {}
+        
+        if None in (origin.get('latitude'), origin.get('longitude'),
+                    destination.get('latitude'), destination.get('longitude')):
+            return jsonify({
+                "success": False,
+                "error": "origin and destination latitude/longitude are required"
+            }), 400
+        
+        metric = data.get('metric', 'duration')
+        if metric not in METRICS:
+            return jsonify({
+                "success": False,
+                "error": f"metric must be one of {list(METRICS)}"
+            }), 400
+        
+        k = int(data.get('k', 3))
+        walk_radius = float(data.get('walk_radius', 1))  # km
+        transfer_penalty = float(data.get('transfer_penalty', Config.JOURNEY_TRANSFER_PENALTY_MIN))
+        try:
+            mask = parse_constraints(data)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
+        snapshot = network.get()
+        graph = snapshot.graph
+        
+        # Gắn mỗi điểm vào k trạm gần nhất (grid index) thỏa điều kiện lọc, kèm quãng đi bộ
+        access = graph.snap(float(origin['latitude']), float(origin['longitude']), k, walk_radius, mask)
+        egress = graph.snap(float(destination['latitude']), float(destination['longitude']), k, walk_radius, mask)
+        if not access or not egress:
+            return jsonify({
+                "success": False,
+                "error": f"No station within {walk_radius} km of the {'origin' if not access else 'destination'}"
+            }), 404
+        
+        # Một lần Dijkstra đa nguồn/đa đích: chi phí khởi đầu = đi bộ tới trạm,
+        # chi phí kết thúc = đi bộ từ trạm tới đích -> chọn luôn trạm lên/xuống tốt nhất
+        path = graph.multi_search(
+            {u: walk_cost(km, metric) for u, km in access.items()},
+            {u: walk_cost(km, metric) for u, km in egress.items()},
+            metric, mask
+        )
+        if path is None:
+            return jsonify({
+                "success": False,
+                "error": "No route connects the stations near origin and destination"
+            }), 404
+        
+        walk = {
+            "origin": {
+                "distance": access[path['source']],
+                "walk_minutes": walk_cost(access[path['source']])
+            },
+            "destination": {
+                "distance": egress[path['target']],
+                "walk_minutes": walk_cost(egress[path['target']])
+            }
+        }
+        journey = build_journey(
+            graph, snapshot.index, path, transfer_penalty,
+            metric=metric, algorithm='multi_source_dijkstra'
+        )
+        walk_minutes = walk['origin']['walk_minutes'] + walk['destination']['walk_minutes']
+        
+        return jsonify({
+            "success": True,
+            "data": {
+                **journey,
+                "walk": walk,
+                "walk_minutes": walk_minutes,
+                "door_to_door_duration": journey['total_duration'] + walk_minutes,
+                "candidates": {"origin": len(access), "destination": len(egress)}
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@journey_bp.route('/footpaths', methods=['POST'])
+@jwt_required()
+def regenerate_footpaths():
+    """Regenerate walking edges between stations within the walking radius"""
+    try:
+        data = request.get_json(silent=True) or {}
+        radius = float(data.get('radius', Config.JOURNEY_FOOTPATH_RADIUS_KM))  # km
+        if radius <= 0:
+            return jsonify({
+                "success": False,
+                "error": "radius must be positive"
+            }), 400
+        
+        # Cặp trạm trong bán kính: grid bucket + haversine vector hóa, lưu vào
+        # connects với mode='walk' để graph/hub labels dùng như cạnh bình thường
+        removed, inserted = rebuild_footpaths(radius_km=radius)
+        network.invalidate()
+        
+        return jsonify({
+            "success": True,
+            "data": {
+                "radius": radius,
+                "removed": removed,
+                "inserted": inserted
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
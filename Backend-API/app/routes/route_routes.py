@@ -1,7 +1,10 @@
 from flask import Blueprint, request, jsonify
 from app.utils.db_connection import db_connection
+from app.utils.pagination import list_page
+from app.utils.projection import parse_fields, projection
 from flask_jwt_extended import jwt_required
 from app.models.route import Route
+from app.utils.network import network
 route_bp = Blueprint('route', __name__, url_prefix='/api/routes')
 from uuid import uuid4
 @route_bp.route('/', methods=['GET'])
@@ -11,10 +14,14 @@ def get_all_routes():
     try:
         db = db_connection.get_db()
         
-        # Pagination
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 20))
-        offset = (page - 1) * limit
+        # ?fields=a,b: chỉ lấy các thuộc tính cần (KEEP trong AQL); luôn giữ _key, route_code cho cursor
+        try:
+            fields = parse_fields(request.args.get('fields'), always=('_key', 'route_code'))
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
         
         # Filters
         status = request.args.get('status')
@@ -23,7 +30,7 @@ def get_all_routes():
         # Build query
         aql = "FOR route IN routes"
         filters = []
-        bind_vars = {'offset': offset, 'limit': limit}
+        bind_vars = {}
         
         if status:
             filters.append("route.status == @status")
@@ -35,29 +42,21 @@ def get_all_routes():
         if filters:
             aql += " FILTER " + " AND ".join(filters)
         
-        # Count
-        count_aql = aql + " COLLECT WITH COUNT INTO total RETURN total"
-        count_result = db.AQLQuery(
-            count_aql,
-            bindVars={k: v for k, v in bind_vars.items() if k not in ['offset', 'limit']},
-            rawResults=True
-        )
-        total = list(count_result)[0] if list(count_result) else 0
-        
-        # Get data
-        aql += " SORT route.route_code LIMIT @offset, @limit RETURN route"
-        result = db.AQLQuery(aql, bindVars=bind_vars, rawResults=True)
-        routes = list(result)
+        # Pagination: ?cursor= (keyset, empty for the first page) or ?page= (offset);
+        # count=false bỏ qua việc đếm tổng (infinite scroll). Tổng lấy từ fullCount cùng lần gọi AQL
+        try:
+            routes, pagination = list_page(db, aql, 'route', 'route_code', fields, bind_vars,
+                                           request.args, default_limit=20)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
         
         return jsonify({
             "success": True,
             "data": routes,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total,
-                "pages": (total + limit - 1) // limit
-            }
+            "pagination": pagination
         }), 200
         
     except Exception as e:
@@ -72,8 +71,18 @@ def get_route(route_id):
     try:
         db = db_connection.get_db()
         
+        # ?fields=a,b: chỉ lấy các thuộc tính cần của tuyến
+        try:
+            fields = parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
         # Get route with stations
-        aql = """
+        bind_vars = {'route_id': route_id}
+        aql = f"""
         LET route = FIRST(
             FOR r IN routes
                 FILTER r.route_id == @route_id
@@ -83,21 +92,20 @@ def get_route(route_id):
         LET stations = (
             FOR v, e IN OUTBOUND CONCAT('routes/', route._key) serves
                 SORT e.stop_order
-                RETURN {
+                RETURN {{
                     station: v,
                     stop_order: e.stop_order,
                     arrival_offset: e.arrival_offset,
                     is_main_stop: e.is_main_stop
-                }
+                }}
         )
         
-        RETURN {
-            route: route,
+        RETURN {{
+            route: {projection('route', fields, bind_vars)},
             stations: stations
-        }
+        }}
         """
         
-        bind_vars = {'route_id': route_id}
         result = db.AQLQuery(aql, bindVars=bind_vars, rawResults=True)
         data = list(result)
         
@@ -138,6 +146,7 @@ def create_route():
         collection = db_connection.get_collection('routes')
         doc = collection.createDocument(route.to_dict())
         doc.save()
+        network.invalidate()
         
         return jsonify({
             "success": True,
@@ -199,6 +208,7 @@ def update_route(route_id):
         
         result = db.AQLQuery(aql_update, bindVars=bind_vars, rawResults=True)
         updated_route = list(result)[0]
+        network.invalidate()
         
         return jsonify({
             "success": True,
@@ -268,6 +278,7 @@ def delete_route(route_id):
         """
         
         db.AQLQuery(aql_delete, bindVars=bind_vars)
+        network.invalidate()
         
         return jsonify({
             "success": True,
@@ -322,6 +333,7 @@ def add_stop_to_route(route_id):
         
         edge = serves_collection.createDocument(edge_data)
         edge.save()
+        network.invalidate()
         
         return jsonify({
             "success": True,
@@ -367,6 +379,8 @@ def remove_stop_from_route(route_id, station_id):
                 "error": "Stop not found in route"
             }), 404
         
+        network.invalidate()
+        
         return jsonify({
             "success": True,
             "message": "Stop removed from route"
@@ -413,6 +427,8 @@ def update_route_stops(route_id):
                 'is_main_stop': stop.get('is_main_stop', False)
             }, rawResults=True)
         
+        network.invalidate()
+        
         return jsonify({
             "success": True,
             "message": "Route stops updated"
@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from datetime import datetime
 from app.utils.db_connection import db_connection
 from flask_jwt_extended import jwt_required, get_jwt
+from app.utils.network import network
 
 schedule_bp = Blueprint('schedules', __name__, url_prefix='/api/schedules')
 
@@ -82,6 +83,9 @@ def create_schedule():
         doc = collection.createDocument(data)
         doc.save()
         
+        # Lịch chạy thay đổi -> timetable dựng lại theo version mới
+        network.invalidate()
+        
         return jsonify({
             "success": True,
             "message": "Schedule created successfully",
@@ -108,6 +112,7 @@ def delete_schedule(schedule_id):
         """
         
         db.AQLQuery(aql_delete, bindVars={'schedule_id': schedule_id})
+        network.invalidate()
         
         return jsonify({
             "success": True,
@@ -1,12 +1,22 @@
 
+import json
+from datetime import datetime
 from flask import Blueprint, request, jsonify
+from app.config import Config
+from app.utils.bulk import bulk_filter, insert_documents
 from app.utils.db_connection import db_connection
-from app.models.station import create_station_document, validate_station_data
+from app.utils.pagination import list_page
+from app.utils.projection import parse_fields, projection
+from app.models.station import create_station_document, validate_station_data, validate_station_update
 from flask_jwt_extended import jwt_required, get_jwt
-from app.utils.redis_connection import cache_response, invalidate_cache
+from app.utils.redis_connection import cache_response, invalidate_cache, invalidate_cache_for
+from app.utils.network import network
 
 station_bp = Blueprint('station', __name__, url_prefix='/api/stations')
 
+# Attributes a bulk update/delete may select stations by (besides a list of station_id)
+STATION_BULK_FILTERS = ('status', 'type', 'address.ward', 'address.city')
+
 @station_bp.route('/', methods=['GET'])
 @jwt_required()
 @cache_response(ttl=180, key_prefix='stations_list')  # Cache 3 minutes
@@ -16,10 +26,14 @@ def get_all_stations():
     try:
         db = db_connection.get_db()
         
-        # Pagination parameters
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 100))
-        offset = (page - 1) * limit
+        # ?fields=a,b: chỉ lấy các thuộc tính cần (KEEP trong AQL); luôn giữ _key, name cho cursor
+        try:
+            fields = parse_fields(request.args.get('fields'), always=('_key', 'name'))
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
         
         # Filters
         status = request.args.get('status')
@@ -28,10 +42,7 @@ def get_all_stations():
         # Build AQL query
         aql = "FOR station IN stations"
         filters = []
-        bind_vars = {
-            'offset': offset,
-            'limit': limit
-        }
+        bind_vars = {}
         
         if status:
             filters.append("station.status == @status")
@@ -43,29 +54,21 @@ def get_all_stations():
         if filters:
             aql += " FILTER " + " AND ".join(filters)
         
-        # Count total
-        count_aql = aql + " COLLECT WITH COUNT INTO total RETURN total"
-        count_result = db.AQLQuery(
-            count_aql, 
-            bindVars={k: v for k, v in bind_vars.items() if k not in ['offset', 'limit']}, 
-            rawResults=True
-        )
-        total = list(count_result)[0] if list(count_result) else 0
-        
-        # Get paginated data
-        aql += " SORT station.name LIMIT @offset, @limit RETURN station"
-        result = db.AQLQuery(aql, bindVars=bind_vars, rawResults=True)
-        stations = list(result)
+        # Pagination: ?cursor= (keyset, empty for the first page) or ?page= (offset);
+        # count=false bỏ qua việc đếm tổng (infinite scroll). Tổng lấy từ fullCount cùng lần gọi AQL
+        try:
+            stations, pagination = list_page(db, aql, 'station', 'name', fields, bind_vars,
+                                             request.args, default_limit=100)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
         
         return jsonify({
             "success": True,
             "data": stations,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total,
-                "pages": (total + limit - 1) // limit
-            }
+            "pagination": pagination
         }), 200
         
     except Exception as e:
@@ -77,21 +80,31 @@ def get_all_stations():
 
 @station_bp.route('/<station_id>', methods=['GET'])
 @jwt_required()
-@cache_response(ttl=300, key_prefix='station_detail')  # Cache 5 minutes
+@cache_response(ttl=300, key_prefix='station_detail', key_arg='station_id')  # Cache 5 minutes
 
 def get_station(station_id):
     """Get station by ID with routes passing through"""
     try:
         db = db_connection.get_db()
         
+        # ?fields=a,b: chỉ lấy các thuộc tính cần của trạm
+        try:
+            fields = parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
         # Get station
-        aql_station = """
+        bind_vars = {'station_id': station_id}
+        aql_station = f"""
         FOR station IN stations
         FILTER station.station_id == @station_id
-        RETURN station
+        RETURN {projection('station', fields, bind_vars)}
         """
         
-        station_result = db.AQLQuery(aql_station, bindVars={'station_id': station_id}, rawResults=True)
+        station_result = db.AQLQuery(aql_station, bindVars=bind_vars, rawResults=True)
         stations_list = list(station_result)
         
         if not stations_list:
@@ -197,6 +210,7 @@ def create_station():
               # Invalidate related caches
         invalidate_cache('stations_list:*')
         invalidate_cache('analytics_*')
+        network.invalidate()
         
         return jsonify({
             "success": True,
@@ -211,6 +225,228 @@ def create_station():
             "error": str(e)
         }), 500
 
+@station_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+def import_stations():
+    """Import stations from a streamed NDJSON body (one station per line)"""
+    created = 0
+    try:
+        db = db_connection.get_db()
+        batch_size = max(Config.STATION_IMPORT_BATCH_SIZE, 1)
+        received = 0
+        errors = []
+        seen = set()
+        batch = []  # (line, station_id, document)
+
+        def flush():
+            # Một truy vấn kiểm tra trùng station_id + một lần bulk insert cho cả lô
+            nonlocal created
+            try:
+                ids = [station_id for _, station_id, _ in batch]
+                existing = set(db.AQLQuery(
+                    "FOR s IN stations FILTER s.station_id IN @ids RETURN s.station_id",
+                    bindVars={'ids': ids}, rawResults=True, batchSize=len(ids)
+                ))
+                rows = []
+                for line, station_id, doc in batch:
+                    if station_id in existing:
+                        errors.append({"line": line, "station_id": station_id, "error": "Station ID already exists"})
+                    else:
+                        rows.append((line, station_id, doc))
+                results = insert_documents(db, 'stations', [doc for _, _, doc in rows])
+                for (line, station_id, _), result in zip(rows, results):
+                    if result.get('error'):
+                        errors.append({"line": line, "station_id": station_id, "error": result.get('errorMessage')})
+                    else:
+                        created += 1
+            except Exception as e:
+                # Lô lỗi -> ghi lỗi cho các dòng chưa có kết quả, các lô trước vẫn giữ nguyên
+                reported = {error['line'] for error in errors}
+                for line, station_id, _ in batch:
+                    if line not in reported:
+                        errors.append({"line": line, "station_id": station_id, "error": f"Insert failed: {e}"})
+            finally:
+                batch.clear()
+
+        # Đọc từng dòng từ stream, không nạp cả body vào bộ nhớ
+        for line, raw in enumerate(request.stream, start=1):
+            raw = raw.strip()
+            if not raw:
+                continue
+            received += 1
+            try:
+                data = json.loads(raw)
+            except ValueError:
+                errors.append({"line": line, "station_id": None, "error": "Invalid JSON"})
+                continue
+            if not isinstance(data, dict):
+                errors.append({"line": line, "station_id": None, "error": "Each line must be a JSON object"})
+                continue
+
+            station_id = data.get('station_id')
+            try:
+                is_valid, error = validate_station_data(data)
+                if is_valid and station_id in seen:
+                    is_valid, error = False, "Duplicate station ID in upload"
+                if not is_valid:
+                    errors.append({"line": line, "station_id": station_id, "error": error})
+                    continue
+                doc = create_station_document(data)
+            except Exception as e:
+                # Dòng lỗi bất kỳ chỉ bị bỏ qua, không làm hỏng cả file
+                errors.append({"line": line, "station_id": station_id, "error": f"Invalid value: {e}"})
+                continue
+
+            seen.add(station_id)
+            batch.append((line, station_id, doc))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+        errors.sort(key=lambda e: e['line'])
+        return jsonify({
+            "success": True,
+            "data": {
+                "received": received,
+                "created": created,
+                "failed": len(errors),
+                "errors": errors
+            }
+        }), 201 if created else 200
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+    finally:
+        # Invalidate một lần cho cả file (kể cả khi lỗi giữa chừng sau khi đã ghi vài lô)
+        if created > 0:
+            invalidate_cache('stations_list:*')
+            invalidate_cache('analytics_*')
+            network.invalidate()
+
+@station_bp.route('/bulk', methods=['PATCH'])
+@jwt_required()
+def bulk_update_stations():
+    """Update many stations (by ids or filter) with one AQL UPDATE"""
+    try:
+        data = request.get_json() or {}
+        changes = data.get('set')
+
+        is_valid, error = validate_station_update(changes)
+        if not is_valid:
+            return jsonify({
+                "success": False,
+                "error": error
+            }), 400
+
+        # Chuẩn hóa giống update_station
+        changes = dict(changes)
+        if 'address' in changes:
+            changes['address'] = {
+                'street': changes['address'].get('street'),
+                'ward': changes['address'].get('ward'),
+                'city': changes['address'].get('city', 'TP.HCM')
+            }
+        changes['updated_at'] = datetime.now().isoformat()
+
+        bind_vars = {'changes': changes}
+        try:
+            selection = bulk_filter('station', 'station_id', data, STATION_BULK_FILTERS, bind_vars)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+
+        # Một truy vấn set-based; mergeObjects=false để address/facilities thay thế như update_station
+        aql = f"""
+        RETURN (
+            FOR station IN stations{selection}
+                UPDATE station WITH @changes IN stations OPTIONS {{ mergeObjects: false }}
+                RETURN NEW.station_id
+        )
+        """
+        db = db_connection.get_db()
+        updated = list(db.AQLQuery(aql, bindVars=bind_vars, rawResults=True))[0]
+
+        if updated:
+            # Chi tiết: chỉ xóa cache của các trạm bị sửa; danh sách/thống kê phụ thuộc mọi trạm nên xóa theo prefix
+            invalidate_cache_for('station_detail', updated)
+            invalidate_cache('stations_list:*')
+            invalidate_cache('analytics_*')
+            network.invalidate()
+
+        result = {
+            "updated": len(updated),
+            "station_ids": updated
+        }
+        if 'ids' in data:
+            found = set(updated)
+            result["not_found"] = [i for i in data['ids'] if i not in found]
+        return jsonify({
+            "success": True,
+            "data": result
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@station_bp.route('/bulk', methods=['DELETE'])
+@jwt_required()
+def bulk_delete_stations():
+    """Delete many stations (by ids or filter) with one AQL REMOVE"""
+    try:
+        data = request.get_json() or {}
+
+        bind_vars = {}
+        try:
+            selection = bulk_filter('station', 'station_id', data, STATION_BULK_FILTERS, bind_vars)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+
+        aql = f"""
+        RETURN (
+            FOR station IN stations{selection}
+                REMOVE station IN stations
+                RETURN OLD.station_id
+        )
+        """
+        db = db_connection.get_db()
+        deleted = list(db.AQLQuery(aql, bindVars=bind_vars, rawResults=True))[0]
+
+        if deleted:
+            invalidate_cache_for('station_detail', deleted)
+            invalidate_cache('stations_list:*')
+            invalidate_cache('analytics_*')
+            network.invalidate()
+
+        result = {
+            "deleted": len(deleted),
+            "station_ids": deleted
+        }
+        if 'ids' in data:
+            found = set(deleted)
+            result["not_found"] = [i for i in data['ids'] if i not in found]
+        return jsonify({
+            "success": True,
+            "data": result
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
 @station_bp.route('/<station_id>', methods=['PUT'])
 @jwt_required()
 def update_station(station_id):
@@ -255,8 +491,9 @@ def update_station(station_id):
         station_doc.save()
         
         invalidate_cache('stations_list:*')
-        invalidate_cache(f'station_detail:*{station_id}*')
+        invalidate_cache_for('station_detail', [station_id])
         invalidate_cache('analytics_*')
+        network.invalidate()
         
         return jsonify({
             "success": True,
@@ -293,7 +530,7 @@ def delete_station(station_id):
                 # Invalidate related caches
         invalidate_cache('stations_*')
         invalidate_cache('analytics_*')
-        invalidate_cache('journey_*')
+        network.invalidate()
         return jsonify({
             "success": True,
             "message": "Station deleted successfully"
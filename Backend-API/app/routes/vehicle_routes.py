@@ -1,10 +1,19 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
+from app.utils.bulk import bulk_filter
 from app.utils.db_connection import db_connection
+from app.utils.pagination import list_page
+from app.utils.projection import parse_fields, projection
+from app.utils.redis_connection import invalidate_cache
 from flask_jwt_extended import jwt_required, get_jwt
 
 vehicle_bp = Blueprint('vehicles', __name__, url_prefix='/api/vehicles')
 
+# Attributes a bulk update/delete may select vehicles by (besides a list of vehicle_id)
+VEHICLE_BULK_FILTERS = ('status', 'type')
+# Identity attributes a bulk update must not touch
+VEHICLE_PROTECTED_FIELDS = ('_key', '_id', '_rev', 'vehicle_id', 'created_at')
+
 def require_permission(permission):
     """Decorator to check user permissions"""
     def decorator(fn):
@@ -32,10 +41,14 @@ def get_all_vehicles():
     try:
         db = db_connection.get_db()
         
-        # Pagination
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 20))
-        offset = (page - 1) * limit
+        # ?fields=a,b: chỉ lấy các thuộc tính cần (KEEP trong AQL); luôn giữ _key, license_plate cho cursor
+        try:
+            fields = parse_fields(request.args.get('fields'), always=('_key', 'license_plate'))
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
         
         # Filters
         status = request.args.get('status')
@@ -44,7 +57,7 @@ def get_all_vehicles():
         # Build query
         aql = "FOR vehicle IN vehicles"
         filters = []
-        bind_vars = {'offset': offset, 'limit': limit}
+        bind_vars = {}
         
         if status:
             filters.append("vehicle.status == @status")
@@ -56,29 +69,21 @@ def get_all_vehicles():
         if filters:
             aql += " FILTER " + " AND ".join(filters)
         
-        # Count
-        count_aql = aql + " COLLECT WITH COUNT INTO total RETURN total"
-        count_result = db.AQLQuery(
-            count_aql,
-            bindVars={k: v for k, v in bind_vars.items() if k not in ['offset', 'limit']},
-            rawResults=True
-        )
-        total = list(count_result)[0] if list(count_result) else 0
-        
-        # Get data
-        aql += " SORT vehicle.license_plate LIMIT @offset, @limit RETURN vehicle"
-        result = db.AQLQuery(aql, bindVars=bind_vars, rawResults=True)
-        vehicles = list(result)
+        # Pagination: ?cursor= (keyset, empty for the first page) or ?page= (offset);
+        # count=false bỏ qua việc đếm tổng (infinite scroll). Tổng lấy từ fullCount cùng lần gọi AQL
+        try:
+            vehicles, pagination = list_page(db, aql, 'vehicle', 'license_plate', fields, bind_vars,
+                                             request.args, default_limit=20)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
         
         return jsonify({
             "success": True,
             "data": vehicles,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total,
-                "pages": (total + limit - 1) // limit
-            }
+            "pagination": pagination
         }), 200
         
     except Exception as e:
@@ -95,7 +100,17 @@ def get_vehicle(vehicle_id):
     try:
         db = db_connection.get_db()
         
-        aql = """
+        # ?fields=a,b: chỉ lấy các thuộc tính cần của xe
+        try:
+            fields = parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
+        bind_vars = {'vehicle_id': vehicle_id}
+        aql = f"""
         LET vehicle = FIRST(
             FOR v IN vehicles
                 FILTER v.vehicle_id == @vehicle_id
@@ -104,19 +119,18 @@ def get_vehicle(vehicle_id):
         
         LET current_route = FIRST(
             FOR v, e IN OUTBOUND CONCAT('vehicles/', vehicle._key) operates_on
-                RETURN {
+                RETURN {{
                     route: v,
                     assignment: e
-                }
+                }}
         )
         
-        RETURN {
-            vehicle: vehicle,
+        RETURN {{
+            vehicle: {projection('vehicle', fields, bind_vars)},
             current_route: current_route
-        }
+        }}
         """
         
-        bind_vars = {'vehicle_id': vehicle_id}
         result = db.AQLQuery(aql, bindVars=bind_vars, rawResults=True)
         data = list(result)
         
@@ -173,6 +187,119 @@ def create_vehicle():
             "error": str(e)
         }), 500
 
+@vehicle_bp.route('/bulk', methods=['PATCH'])
+@require_permission('write')
+def bulk_update_vehicles():
+    """Update many vehicles (by ids or filter) with one AQL UPDATE"""
+    try:
+        data = request.get_json() or {}
+        changes = data.get('set')
+
+        if not isinstance(changes, dict) or not changes:
+            return jsonify({
+                "success": False,
+                "error": "'set' must be a non-empty object"
+            }), 400
+        protected = [field for field in changes if field in VEHICLE_PROTECTED_FIELDS]
+        if protected:
+            return jsonify({
+                "success": False,
+                "error": f"Field cannot be updated: {protected[0]}"
+            }), 400
+
+        changes = dict(changes)
+        changes['updated_at'] = datetime.now().isoformat()
+
+        bind_vars = {'changes': changes}
+        try:
+            selection = bulk_filter('vehicle', 'vehicle_id', data, VEHICLE_BULK_FILTERS, bind_vars)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+
+        # Một truy vấn set-based thay cho check + update từng xe
+        aql = f"""
+        RETURN (
+            FOR vehicle IN vehicles{selection}
+                UPDATE vehicle WITH @changes IN vehicles
+                RETURN NEW.vehicle_id
+        )
+        """
+        db = db_connection.get_db()
+        updated = list(db.AQLQuery(aql, bindVars=bind_vars, rawResults=True))[0]
+
+        if updated:
+            invalidate_cache('analytics_overview:*')
+            invalidate_cache('analytics_vehicles:*')
+
+        result = {
+            "updated": len(updated),
+            "vehicle_ids": updated
+        }
+        if 'ids' in data:
+            found = set(updated)
+            result["not_found"] = [i for i in data['ids'] if i not in found]
+        return jsonify({
+            "success": True,
+            "data": result
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@vehicle_bp.route('/bulk', methods=['DELETE'])
+@require_permission('delete')
+def bulk_delete_vehicles():
+    """Delete many vehicles (by ids or filter) with one AQL REMOVE"""
+    try:
+        data = request.get_json() or {}
+
+        bind_vars = {}
+        try:
+            selection = bulk_filter('vehicle', 'vehicle_id', data, VEHICLE_BULK_FILTERS, bind_vars)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+
+        aql = f"""
+        RETURN (
+            FOR vehicle IN vehicles{selection}
+                REMOVE vehicle IN vehicles
+                RETURN OLD.vehicle_id
+        )
+        """
+        db = db_connection.get_db()
+        deleted = list(db.AQLQuery(aql, bindVars=bind_vars, rawResults=True))[0]
+
+        if deleted:
+            invalidate_cache('analytics_overview:*')
+            invalidate_cache('analytics_vehicles:*')
+
+        result = {
+            "deleted": len(deleted),
+            "vehicle_ids": deleted
+        }
+        if 'ids' in data:
+            found = set(deleted)
+            result["not_found"] = [i for i in data['ids'] if i not in found]
+        return jsonify({
+            "success": True,
+            "data": result
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
 @vehicle_bp.route('/<vehicle_id>', methods=['PUT'])
 @require_permission('write')
 def update_vehicle(vehicle_id):
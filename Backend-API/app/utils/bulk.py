@@ -0,0 +1,45 @@
+import json
+
+def insert_documents(db, collection, docs):
+    """Insert docs with a single POST /_api/document/<collection> call.
+
+    Returns one result per document, in input order: {'_key', '_id', '_rev'}
+    on success or {'error': True, 'errorNum', 'errorMessage'} for rows the
+    server rejected; the other rows are still inserted.
+    """
+    if not docs:
+        return []
+    url = f"{db.getURL()}/document/{collection}"
+    response = db.connection.session.post(url, data=json.dumps(docs, default=str))
+    data = response.json()
+    if not isinstance(data, list):
+        raise RuntimeError(data.get('errorMessage') or f"Bulk insert into {collection} failed")
+    return data
+
+def bulk_filter(var, id_field, body, filter_fields, bind_vars):
+    """AQL FILTER for the documents a bulk request targets; adds its bind variables.
+
+    body carries either 'ids' (values of id_field) or 'filter', an object of
+    equality conditions on filter_fields (a list value means IN). Raises
+    ValueError for anything else, so an empty selection never reaches a
+    whole-collection UPDATE/REMOVE.
+    """
+    ids = body.get('ids')
+    criteria = body.get('filter')
+    if (ids is None) == (criteria is None):
+        raise ValueError("Provide either 'ids' or 'filter'")
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, str) for i in ids):
+            raise ValueError("'ids' must be a non-empty list of strings")
+        bind_vars['ids'] = ids
+        return f" FILTER {var}.{id_field} IN @ids"
+    if not isinstance(criteria, dict) or not criteria:
+        raise ValueError("'filter' must be a non-empty object")
+    clauses = []
+    for i, (field, value) in enumerate(sorted(criteria.items())):
+        if field not in filter_fields:
+            raise ValueError(f"Cannot filter on '{field}' (allowed: {', '.join(filter_fields)})")
+        bind_vars[f'filter_{i}'] = value
+        operator = 'IN' if isinstance(value, list) else '=='
+        clauses.append(f"{var}.{field} {operator} @filter_{i}")
+    return " FILTER " + " AND ".join(clauses)
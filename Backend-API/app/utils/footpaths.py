@@ -0,0 +1,90 @@
+import numpy as np
+from app.config import Config
+from app.utils.db_connection import db_connection
+from app.utils.spatial_index import GridIndex, KM_PER_DEGREE, haversine
+
+# connects.mode of generated walking edges (hand-entered edges have no mode)
+WALK_MODE = 'walk'
+INSERT_BATCH = 1000
+
+def station_pairs_within(lat, lng, radius_km):
+    """All index pairs (i < j) closer than radius_km: (i, j, meters).
+
+    Stations are bucketed on a grid with radius-sized cells, so every pair
+    within the radius sits in the same or an adjacent cell; each cell is
+    compared against its neighbouring cells with one vectorized haversine.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    grid = GridIndex(lat, lng, cell_km=radius_km)
+    # Cell width is set at the mean latitude; poleward stations need a wider column reach
+    max_lat = float(np.abs(lat).max()) if len(lat) else 0.0
+    col_reach = int(np.ceil(radius_km / (grid.cell_lng * KM_PER_DEGREE * max(np.cos(np.radians(max_lat)), 0.01))))
+
+    found_i, found_j, found_d = [], [], []
+    for (r, c), ids in grid.cells.items():
+        near = [grid.cells[(r + dr, c + dc)]
+                for dr in (-1, 0, 1)
+                for dc in range(-col_reach, col_reach + 1)
+                if (r + dr, c + dc) in grid.cells]
+        near = np.concatenate(near)
+        dist = haversine(lat[ids][:, None], lng[ids][:, None], lat[near][None, :], lng[near][None, :])
+        mask = (dist <= radius_km * 1000) & (ids[:, None] < near[None, :])
+        rows, cols = np.nonzero(mask)
+        found_i.append(ids[rows])
+        found_j.append(near[cols])
+        found_d.append(dist[rows, cols])
+
+    if not found_i:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    return np.concatenate(found_i), np.concatenate(found_j), np.concatenate(found_d)
+
+
+def footpath_edges(stations, radius_km=None, directed=None):
+    """Walking edges between stations within radius_km.
+
+    One edge per pair: the station graph already mirrors every edge unless
+    `connects` is read as one-way (JOURNEY_DIRECTED_EDGES), which is the
+    only case that needs the reverse edge stored too.
+    """
+    radius_km = radius_km or Config.JOURNEY_FOOTPATH_RADIUS_KM
+    directed = Config.JOURNEY_DIRECTED_EDGES if directed is None else directed
+    located = [s for s in stations if (s.get('location') or {}).get('latitude') is not None]
+    lat = [s['location']['latitude'] for s in located]
+    lng = [s['location'].get('longitude') for s in located]
+    pairs_i, pairs_j, meters = station_pairs_within(lat, lng, radius_km)
+
+    # Street distance ~ straight line x detour factor
+    distance = np.round(meters * Config.JOURNEY_WALK_DETOUR, 1)
+    duration = np.round(distance / 1000 / Config.JOURNEY_WALK_SPEED_KMH * 60, 1)
+    edges = []
+    for i, j, d, t in zip(pairs_i.tolist(), pairs_j.tolist(), distance.tolist(), duration.tolist()):
+        for a, b in (((i, j), (j, i)) if directed else ((i, j),)):
+            edges.append({
+                '_from': located[a]['_id'],
+                '_to': located[b]['_id'],
+                'distance': d,
+                'duration': t,
+                'mode': WALK_MODE
+            })
+    return edges
+
+
+def rebuild_footpaths(db=None, radius_km=None):
+    """Replace the generated walking edges in `connects`; returns (removed, inserted)"""
+    db = db or db_connection.get_db()
+    stations = list(db.AQLQuery(
+        "FOR s IN stations RETURN KEEP(s, '_id', 'location')", rawResults=True, batchSize=1000
+    ))
+    edges = footpath_edges(stations, radius_km)
+
+    removed = list(db.AQLQuery(
+        "FOR c IN connects FILTER c.mode == @mode REMOVE c IN connects COLLECT WITH COUNT INTO n RETURN n",
+        bindVars={'mode': WALK_MODE}, rawResults=True
+    ))[0]
+    for start in range(0, len(edges), INSERT_BATCH):
+        db.AQLQuery(
+            "FOR e IN @edges INSERT e INTO connects",
+            bindVars={'edges': edges[start:start + INSERT_BATCH]}
+        )
+    return removed, len(edges)
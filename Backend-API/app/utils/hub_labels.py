@@ -0,0 +1,400 @@
+import glob
+import heapq
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+from app.config import Config
+
+# Arrays written per metric; each is a plain .npy so it can be memory-mapped.
+# Per label entry, *_parent is the flat index of the same hub's entry one node
+# closer to the hub (-1 at the hub itself) and *_arc the graph arc between the two
+LABEL_ARRAYS = ('out_offsets', 'out_hubs', 'out_dist', 'out_parent', 'out_arc',
+                'in_offsets', 'in_hubs', 'in_dist', 'in_parent', 'in_arc')
+# Shortest-path trees sampled to rank hubs by how many shortest paths they cover
+ORDER_SAMPLES = 64
+# Part of the file names: label files written in an older layout are never picked up
+LABEL_FORMAT = 'v2'
+# A build lock older than this is assumed to belong to a dead process
+STALE_LOCK_SECONDS = 3600
+# Offline builder, also run as a child process by HubLabelStore
+BUILD_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                            'scripts', 'build_hub_labels.py')
+
+
+def hub_order(graph, metric='duration', samples=ORDER_SAMPLES):
+    """Nodes ranked by how many sampled shortest paths run through them.
+
+    Dijkstra trees are grown from a fixed pseudo-random set of roots and each
+    node scores the size of its subtree in every tree; degree breaks ties.
+    Plain degree order picks near-arbitrary hubs on grid-like city networks,
+    where almost every station has degree 2 to 4, and labels grow about twice
+    as large.
+    """
+    n = graph.node_count
+    offsets, targets = graph.offsets.tolist(), graph.targets.tolist()
+    weights = graph.weights[metric].tolist()
+    inf = float('inf')
+    score = [0] * n
+    for root in random.Random(0).sample(range(n), min(samples, n)):
+        dist = {root: 0.0}
+        parent = {root: -1}
+        heap = [(0.0, root)]
+        settled = []
+        done = set()
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u in done:
+                continue
+            done.add(u)
+            settled.append(u)
+            for i in range(offsets[u], offsets[u + 1]):
+                v = targets[i]
+                nd = d + weights[i]
+                if nd < dist.get(v, inf):
+                    dist[v] = nd
+                    parent[v] = u
+                    heapq.heappush(heap, (nd, v))
+        # Subtree sizes, leaves first
+        size = {}
+        for u in reversed(settled):
+            subtree = size.get(u, 0) + 1
+            score[u] += subtree
+            if parent[u] >= 0:
+                size[parent[u]] = size.get(parent[u], 0) + subtree
+    degree = (np.diff(graph.offsets) + np.diff(graph.rev_offsets)).tolist()
+    return sorted(range(n), key=lambda u: (-score[u], -degree[u]))
+
+def build_hub_labels(graph, metric='duration'):
+    """Pruned landmark labelling over the station graph.
+
+    Nodes are taken as hubs in hub_order(). From each hub a Dijkstra runs
+    forward (filling in-labels) and backward (filling out-labels), pruned
+    wherever the labels found so far already give the distance. Labels are
+    appended in hub rank order, so every node's label comes out sorted by
+    hub. Each entry also records the arc it was reached by: a labelled
+    node's search parent was labelled by the same hub just before it, so
+    these links lead back to the hub and spell out the path.
+    """
+    n = graph.node_count
+    weights = graph.weights[metric].tolist()
+    offsets, targets = graph.offsets.tolist(), graph.targets.tolist()
+    rev_offsets, rev_sources = graph.rev_offsets.tolist(), graph.rev_sources.tolist()
+    rev_weights = graph.weights[metric][graph.rev_arcs].tolist()
+    arcs = list(range(graph.arc_count))
+    rev_arcs = graph.rev_arcs.tolist()
+
+    order = hub_order(graph, metric)
+
+    # hub -> node: (hub ranks, distances, parent nodes, parent label positions, arcs)
+    label_in = [([], [], [], [], []) for _ in range(n)]
+    label_out = label_in if not graph.directed else [([], [], [], [], []) for _ in range(n)]
+    inf = float('inf')
+    tmp = [inf] * n
+
+    def pruned_search(rank, root, own, labels, offs, heads, ws, arc_ids):
+        hubs, dists = own[root][:2]
+        for h, d in zip(hubs, dists):
+            tmp[h] = d
+        dist = {root: 0.0}
+        parent = {root: (-1, -1)}   # node -> (parent node, arc)
+        heap = [(0.0, root)]
+        settled = set()
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            settled.add(u)
+            u_hubs, u_dists, u_parents, u_positions, u_arcs = labels[u]
+            if any(tmp[h] + dh <= d for h, dh in zip(u_hubs, u_dists)):
+                continue
+            p, arc = parent[u]
+            u_hubs.append(rank)
+            u_dists.append(d)
+            u_parents.append(p)
+            # The parent's entry for this hub is the last one it got
+            u_positions.append(len(labels[p][0]) - 1 if p >= 0 else -1)
+            u_arcs.append(arc)
+            for i in range(offs[u], offs[u + 1]):
+                v = heads[i]
+                nd = d + ws[i]
+                if nd < dist.get(v, inf):
+                    dist[v] = nd
+                    parent[v] = (u, arc_ids[i])
+                    heapq.heappush(heap, (nd, v))
+        for h in hubs:
+            tmp[h] = inf
+
+    for rank, v in enumerate(order):
+        # v -> u distances go into u's in-label, checked against v's out-label
+        pruned_search(rank, v, label_out, label_in, offsets, targets, weights, arcs)
+        if graph.directed:
+            pruned_search(rank, v, label_in, label_out, rev_offsets, rev_sources, rev_weights, rev_arcs)
+
+    arrays = {}
+    sides = (('out', label_out), ('in', label_in)) if graph.directed else (('out', label_in),)
+    for side, labels in sides:
+        sizes = [len(label[0]) for label in labels]
+        total = sum(sizes)
+        label_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(sizes, out=label_offsets[1:])
+        columns = [
+            np.fromiter((x for label in labels for x in label[field]), dtype=dtype, count=total)
+            for field, dtype in enumerate((np.int32, np.float64, np.int64, np.int64, np.int64))
+        ]
+        hubs, dists, parents, positions, arc_column = columns
+        roots = parents < 0
+        parent_entries = label_offsets[np.where(roots, 0, parents)] + positions
+        parent_entries[roots] = -1
+        arrays.update({
+            f'{side}_offsets': label_offsets,
+            f'{side}_hubs': hubs,
+            f'{side}_dist': dists,
+            f'{side}_parent': parent_entries,
+            f'{side}_arc': arc_column
+        })
+    if not graph.directed:
+        # One label serves both directions. Its arcs run parent -> node, which is
+        # what in-walks need; out-walks take each arc's mirror (node -> parent)
+        arcs_in = arrays['in_arc'] = arrays['out_arc']
+        arrays['out_arc'] = np.where(arcs_in >= 0, mirror_arcs(graph)[np.maximum(arcs_in, 0)], -1)
+    return HubLabels(arrays, metric, graph.fingerprint)
+
+def mirror_arcs(graph):
+    """For an undirected graph, the arc v -> u for every arc u -> v (same edge)"""
+    tails = np.repeat(np.arange(graph.node_count), np.diff(graph.offsets))
+    forward = np.lexsort((graph.arc_edges, graph.targets, tails))
+    backward = np.lexsort((graph.arc_edges, tails, graph.targets))
+    mirror = np.empty(graph.arc_count, dtype=np.int64)
+    mirror[forward] = backward
+    return mirror
+
+
+class HubLabels:
+    """Hub labels for one metric: dist(s, t) = min over shared hubs of out(s) + in(t)"""
+
+    def __init__(self, arrays, metric, fingerprint):
+        self.metric = metric
+        self.fingerprint = fingerprint
+        # Undirected graphs have one label per node serving both directions (only the arcs differ)
+        self.symmetric = 'in_hubs' not in arrays
+        self._names = [name for name in LABEL_ARRAYS if name in arrays]
+        for name in LABEL_ARRAYS:
+            setattr(self, name, arrays[name] if name in arrays else arrays[name.replace('in_', 'out_', 1)])
+
+    @property
+    def arrays(self):
+        return {name: getattr(self, name) for name in self._names}
+
+    @property
+    def entry_count(self):
+        return sum(len(a) for name, a in self.arrays.items() if name.endswith('_hubs'))
+
+    def distance(self, source, target):
+        """Exact shortest-path cost source -> target, or None if unreachable"""
+        meet = self._meet(source, target)
+        return meet[0] if meet is not None else None
+
+    def _meet(self, source, target):
+        """(cost, out entry, in entry) of the best hub shared by source's out-label and target's in-label"""
+        if source == target:
+            return 0.0, -1, -1
+        a0, a1 = self.out_offsets[source], self.out_offsets[source + 1]
+        b0, b1 = self.in_offsets[target], self.in_offsets[target + 1]
+        _, i, j = np.intersect1d(self.out_hubs[a0:a1], self.in_hubs[b0:b1],
+                                 assume_unique=True, return_indices=True)
+        if not len(i):
+            return None
+        costs = self.out_dist[a0:a1][i] + self.in_dist[b0:b1][j]
+        best = int(costs.argmin())
+        return float(costs[best]), int(a0 + i[best]), int(b0 + j[best])
+
+    def _walk(self, side, entry):
+        """Nodes and arcs from a label entry up to its hub (nodes[0] owns the entry)"""
+        parents = getattr(self, f'{side}_parent')
+        entries = []
+        while entry >= 0:
+            entries.append(entry)
+            entry = int(parents[entry])
+        entries = np.asarray(entries, dtype=np.int64)
+        nodes = np.searchsorted(getattr(self, f'{side}_offsets'), entries, side='right') - 1
+        return nodes.tolist(), getattr(self, f'{side}_arc')[entries[:-1]].tolist()
+
+    def path(self, graph, source, target, metric='duration'):
+        """Spell out source -> hub -> target by following the label entries' parent links.
+
+        Only integer lookups per step, then one vectorized pass for the nodes
+        and arcs. None if target is unreachable.
+        """
+        meet = self._meet(source, target)
+        if meet is None:
+            return None
+        cost, out_entry, in_entry = meet
+        if out_entry < 0:
+            return {'cost': cost, 'nodes': [source], 'arcs': [], 'expanded': 1}
+        up_nodes, up_arcs = self._walk('out', out_entry)      # source ... hub
+        down_nodes, down_arcs = self._walk('in', in_entry)    # target ... hub
+        nodes = up_nodes + down_nodes[-2::-1]
+        arcs = up_arcs + down_arcs[::-1]
+        return {'cost': cost, 'nodes': nodes, 'arcs': arcs, 'expanded': len(nodes)}
+
+    def save(self, base):
+        """Write <base>-<array>.npy files, then <base>-meta.json as the commit marker"""
+        for name, array in self.arrays.items():
+            tmp_path = f"{base}-{name}.npy.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp_path, f"{base}-{name}.npy")
+        meta = {
+            "metric": self.metric,
+            "arrays": list(self.arrays),
+            "fingerprint": self.fingerprint,
+            "nodes": len(self.out_offsets) - 1,
+            "entries": self.entry_count,
+            "built_at": time.strftime('%Y-%m-%dT%H:%M:%S')
+        }
+        with open(f"{base}-meta.json.tmp", 'w') as f:
+            json.dump(meta, f)
+        os.replace(f"{base}-meta.json.tmp", f"{base}-meta.json")
+
+    @classmethod
+    def load(cls, base):
+        """Memory-map the label arrays written by save()"""
+        with open(f"{base}-meta.json") as f:
+            meta = json.load(f)
+        arrays = {name: np.load(f"{base}-{name}.npy", mmap_mode='r') for name in meta['arrays']}
+        return cls(arrays, meta['metric'], meta['fingerprint'])
+
+
+def label_base(graph, metric, directory=None):
+    """File prefix for a graph's labels; the fingerprint changes whenever connects does"""
+    directory = directory or Config.JOURNEY_HUB_LABEL_DIR
+    return os.path.join(directory, f"{metric}-{LABEL_FORMAT}-{graph.fingerprint[:16]}")
+
+
+class HubLabelStore:
+    """Attaches hub labels to station graphs, building missing ones in the background.
+
+    Labels live on disk next to a fingerprint of the graph they were built
+    from. Only JOURNEY_HUB_LABEL_METRICS are used. A worker that finds no
+    file for its graph takes a lock file and runs scripts/build_hub_labels.py
+    as a child process over the graph's arrays: the labelling is pure Python
+    and would hold this worker's GIL for the whole build. Graphs above
+    JOURNEY_HUB_LABEL_BUILD_MAX_STATIONS are never built at runtime, since
+    the build grows much faster than the graph; run the script offline for
+    those. Meanwhile every worker keeps answering with A* and picks the file
+    up once its meta marker appears.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(HubLabelStore, cls).__new__(cls)
+            cls._instance._building = set()
+            cls._instance._lock = threading.Lock()
+        return cls._instance
+
+    def get(self, graph, metric='duration'):
+        """Labels for graph/metric if ready; otherwise make sure a build is underway"""
+        labels = graph.hub_labels.get(metric)
+        if labels is not None or not Config.JOURNEY_HUB_LABELS or metric not in Config.JOURNEY_HUB_LABEL_METRICS:
+            return labels
+        base = label_base(graph, metric)
+        if os.path.exists(f"{base}-meta.json"):
+            try:
+                labels = graph.hub_labels[metric] = HubLabels.load(base)
+                print(f"🏷️  Hub labels ({metric}) mapped from {base}")
+                return labels
+            except Exception as e:
+                print(f"⚠️  Hub label load error: {e}")
+        if graph.node_count <= Config.JOURNEY_HUB_LABEL_BUILD_MAX_STATIONS:
+            self._build_async(graph, metric, base)
+        return None
+
+    def attach(self, graph):
+        """Load or schedule labels for every metric of a freshly loaded graph"""
+        for metric in Config.JOURNEY_HUB_LABEL_METRICS:
+            if self.get(graph, metric) is None and graph.node_count > Config.JOURNEY_HUB_LABEL_BUILD_MAX_STATIONS:
+                print(f"ℹ️  No hub labels ({metric}) for {graph.node_count} stations; "
+                      f"run scripts/build_hub_labels.py (runtime builds stop at "
+                      f"{Config.JOURNEY_HUB_LABEL_BUILD_MAX_STATIONS} stations)")
+
+    def _build_async(self, graph, metric, base):
+        with self._lock:
+            if base in self._building or not self._acquire(base):
+                return
+            self._building.add(base)
+        threading.Thread(target=self._build, args=(graph, metric, base), daemon=True).start()
+
+    def _acquire(self, base):
+        """Create the build lock file; False if another process holds a fresh one"""
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        lock = f"{base}.lock"
+        try:
+            if time.time() - os.path.getmtime(lock) > STALE_LOCK_SECONDS:
+                os.remove(lock)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    def _build(self, graph, metric, base):
+        """Run the builder process for one metric (this thread only waits) and map its output"""
+        scratch = None
+        try:
+            graph_dir = graph.array_dir
+            if graph_dir is None or not os.path.isdir(graph_dir):
+                # Graph built in this process (or its snapshot directory is already gone):
+                # hand its arrays over through a scratch directory
+                from app.utils.station_graph import save_graph_arrays
+                scratch = graph_dir = tempfile.mkdtemp(prefix='graph-', dir=os.path.dirname(base))
+                save_graph_arrays(graph, scratch)
+            command = [sys.executable, BUILD_SCRIPT,
+                       '--graph-dir', os.path.abspath(graph_dir),
+                       '--fingerprint', graph.fingerprint,
+                       '--metric', metric,
+                       '--output', os.path.abspath(base)]
+            if graph.directed:
+                command.append('--directed')
+            started = time.perf_counter()
+            code = subprocess.run(command).returncode
+            if code != 0 or not os.path.exists(f"{base}-meta.json"):
+                raise RuntimeError(f"builder exited with code {code}")
+            labels = graph.hub_labels[metric] = HubLabels.load(base)
+            print(f"🏷️  Hub labels ({metric}) built in {time.perf_counter() - started:.1f}s: "
+                  f"{labels.entry_count} entries for {graph.node_count} stations")
+            self._remove_stale(base, metric)
+        except Exception as e:
+            print(f"❌ Hub label build error: {e}")
+        finally:
+            if scratch:
+                shutil.rmtree(scratch, ignore_errors=True)
+            with self._lock:
+                self._building.discard(base)
+            try:
+                os.remove(f"{base}.lock")
+            except OSError:
+                pass
+
+    @staticmethod
+    def _remove_stale(base, metric):
+        """Delete label files left over from older graphs (mapped copies stay valid)"""
+        prefix = os.path.join(os.path.dirname(base), f"{metric}-")
+        for path in glob.glob(prefix + '*'):
+            if not path.startswith(base) and not path.endswith('.lock'):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+# Singleton instance
+hub_labels = HubLabelStore()
@@ -0,0 +1,119 @@
+import json
+from app.config import Config
+from app.utils.redis_connection import redis_connection, generate_cache_key
+
+# Endpoints whose results are cached; each keeps its own stats
+CACHED_ENDPOINTS = ('shortest-path', 'routes-between')
+# Per endpoint: sorted set of requests per OD pair ("<from>><to>"), hash of hits
+# per OD pair, and counters over all OD pairs
+REQUESTS_KEY = 'journey:stats:{endpoint}:requests'
+HITS_KEY = 'journey:stats:{endpoint}:hits'
+TOTAL_REQUESTS_KEY = 'journey:stats:{endpoint}:total_requests'
+TOTAL_HITS_KEY = 'journey:stats:{endpoint}:total_hits'
+# Trim the OD sets only once they are this much over the cap, not on every request
+STATS_TRIM_SLACK = 1.1
+
+class JourneyCache:
+    """Redis cache of journey results, shared by every worker.
+
+    Keys embed the version of the network snapshot that computed the
+    result, so network.invalidate() retires every entry at once: later
+    requests look under the new version and the old keys just expire.
+    Lookups also count requests and hits per endpoint and origin/destination
+    pair; only the JOURNEY_CACHE_STATS_MAX_PAIRS most requested pairs of an
+    endpoint are kept.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(JourneyCache, cls).__new__(cls)
+        return cls._instance
+
+    def key(self, version, endpoint, from_station, to_station, options=None):
+        """Cache key for one query: network version, endpoint, OD pair and search options"""
+        return generate_cache_key(
+            f"journey:v{version}:{endpoint}",
+            from_station=from_station,
+            to_station=to_station,
+            options=options or {}
+        )
+
+    def get(self, key, endpoint, from_station, to_station):
+        """Cached result or None; records the request (and hit) for the endpoint's OD pair"""
+        redis_client = redis_connection.get_client()
+        if not redis_client or not Config.JOURNEY_CACHE:
+            return None
+        od = f"{from_station}>{to_station}"
+        requests_key, hits_key = REQUESTS_KEY.format(endpoint=endpoint), HITS_KEY.format(endpoint=endpoint)
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.zincrby(requests_key, 1, od)
+            pipe.incr(TOTAL_REQUESTS_KEY.format(endpoint=endpoint))
+            pipe.zcard(requests_key)
+            cached, _, _, pairs = pipe.execute()
+            if cached is not None:
+                pipe.hincrby(hits_key, od, 1)
+                pipe.incr(TOTAL_HITS_KEY.format(endpoint=endpoint))
+                pipe.execute()
+            # After the hit is counted, so a dropped pair never leaves a hit count behind
+            if pairs > Config.JOURNEY_CACHE_STATS_MAX_PAIRS * STATS_TRIM_SLACK:
+                self._trim(redis_client, requests_key, hits_key)
+            if cached is None:
+                return None
+            print(f"🎯 Journey cache HIT: {key}")
+            return json.loads(cached)
+        except Exception as e:
+            print(f"⚠️  Journey cache read error: {e}")
+            return None
+
+    @staticmethod
+    def _trim(redis_client, requests_key, hits_key):
+        """Drop the least requested OD pairs (and their hit counts) down to the cap"""
+        dropped = redis_client.zrange(requests_key, 0, -(Config.JOURNEY_CACHE_STATS_MAX_PAIRS + 1))
+        if dropped:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.zrem(requests_key, *dropped)
+            pipe.hdel(hits_key, *dropped)
+            pipe.execute()
+
+    def put(self, key, result):
+        """Store a result for JOURNEY_CACHE_TTL seconds"""
+        redis_client = redis_connection.get_client()
+        if not redis_client or not Config.JOURNEY_CACHE:
+            return
+        try:
+            redis_client.setex(key, Config.JOURNEY_CACHE_TTL, json.dumps(result))
+        except Exception as e:
+            print(f"⚠️  Journey cache write error: {e}")
+
+    def stats(self, endpoint, limit=20):
+        """Most requested OD pairs of one endpoint with their hit rates, plus its totals"""
+        redis_client = redis_connection.get_client()
+        if not redis_client:
+            return None
+        top = redis_client.zrevrange(REQUESTS_KEY.format(endpoint=endpoint), 0, limit - 1, withscores=True)
+        hits = redis_client.hmget(HITS_KEY.format(endpoint=endpoint), [od for od, _ in top]) if top else []
+        total_requests = int(redis_client.get(TOTAL_REQUESTS_KEY.format(endpoint=endpoint)) or 0)
+        total_hits = int(redis_client.get(TOTAL_HITS_KEY.format(endpoint=endpoint)) or 0)
+        pairs = []
+        for (od, requests), hit in zip(top, hits):
+            from_station, to_station = od.split('>', 1)
+            hit = int(hit or 0)
+            pairs.append({
+                "from_station_id": from_station,
+                "to_station_id": to_station,
+                "requests": int(requests),
+                "hits": hit,
+                "hit_rate": round(hit / requests, 4) if requests else 0.0
+            })
+        return {
+            "requests": total_requests,
+            "hits": total_hits,
+            "hit_rate": round(total_hits / total_requests, 4) if total_requests else 0.0,
+            "od_pairs": pairs
+        }
+
+# Singleton instance
+journey_cache = JourneyCache()
@@ -0,0 +1,394 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from app.config import Config
+from app.utils.db_connection import db_connection
+from app.utils.redis_connection import redis_connection
+from app.utils.hub_labels import hub_labels
+from app.utils.route_index import RouteIndex
+from app.utils.station_graph import (
+    StationGraph, graph_array_names, load_graph_arrays, load_graph_documents, load_station_graph,
+    save_graph_arrays, save_graph_documents
+)
+from app.utils.timetable import Timetable, load_schedules, today
+
+VERSION_KEY = 'network:version'
+# Random id of the Redis version counter's lifetime; a Redis reset starts new snapshot files
+EPOCH_KEY = 'network:epoch'
+# Wait this long before retrying a failed background rebuild
+REBUILD_RETRY_SECONDS = 5
+# Keep a superseded snapshot directory this long: processes started by a worker still
+# on the old version (matrix pool, hub-label builder) open it by path
+SNAPSHOT_GRACE_SECONDS = 600
+# Collections a snapshot is built from; their revisions are recorded with it
+SOURCE_COLLECTIONS = ('stations', 'connects', 'routes', 'serves', 'schedules')
+# Bump the version only if it still has the value the caller saw, so workers
+# that find the same out-of-date snapshot move to one new version together
+ADVANCE_VERSION_SCRIPT = """
+local current = redis.call('GET', KEYS[1]) or '0'
+if current == ARGV[1] then
+    return redis.call('INCR', KEYS[1])
+end
+return tonumber(current)
+"""
+
+class NetworkSnapshot:
+    """One consistent build of every routing structure, never modified after publish.
+
+    A request takes one snapshot and uses its graph, route index and
+    timetables together, so it can never mix data from two versions.
+    """
+
+    def __init__(self, version, graph, index, schedules, source=None):
+        self.version = version
+        self.graph = graph
+        self.index = index
+        self.schedules = schedules
+        # Collection revisions the snapshot was built from (see network_source)
+        self.source = source
+        self.built_at = time.time()
+        # day -> Timetable, filled lazily (today's is built with the snapshot)
+        self._timetables = {}
+        self._timetable_lock = threading.Lock()
+
+    def timetable(self, day=None):
+        """Timetable for a day name (default: today)"""
+        day = day or today()
+        table = self._timetables.get(day)
+        if table is None:
+            with self._timetable_lock:
+                table = self._timetables.get(day)
+                if table is None:
+                    table = self._timetables[day] = Timetable(self.index, self.schedules, day, self.version)
+                    print(f"🕒 Timetable {day} v{self.version} built: "
+                          f"{len(table.trip_routes)} trips, {table.connection_count} connections")
+        return table
+
+
+def network_source(db=None):
+    """Current revision of every source collection.
+
+    Any write changes it, including writes that never bump the network
+    version (the seed and clear scripts go straight to ArangoDB).
+    """
+    db = db or db_connection.get_db()
+    return {name: db[name].revision() for name in SOURCE_COLLECTIONS}
+
+def build_network_snapshot(version, graph, routes, serves, schedules, source=None):
+    """Assemble a NetworkSnapshot around a graph and prebuild today's timetable"""
+    index = RouteIndex(routes, serves, graph.stations_by_id, version=version)
+    snapshot = NetworkSnapshot(version, graph, index, schedules, source)
+    snapshot.timetable()
+    hub_labels.attach(graph)
+    return snapshot
+
+def load_network_snapshot(version, db=None, directory=None, keep=()):
+    """Load stations, connects, routes, serves and schedules into a NetworkSnapshot.
+
+    With a directory, the snapshot is also written there and then mapped
+    back, so this worker serves from the shared files like the others do
+    instead of keeping the documents it just loaded.
+    """
+    db = db or db_connection.get_db()
+    # Read before the documents: a write landing mid-load makes the snapshot look stale, never fresh
+    source = network_source(db)
+    graph = load_station_graph(db)
+    routes = list(db.AQLQuery("FOR r IN routes RETURN r", rawResults=True, batchSize=1000))
+    serves = list(db.AQLQuery("FOR e IN serves RETURN e", rawResults=True, batchSize=1000))
+    schedules = load_schedules(db)
+    if directory:
+        try:
+            save_network_snapshot(directory, version, graph, routes, serves, schedules, keep, source)
+            return map_network_snapshot(directory)
+        except Exception as e:
+            print(f"⚠️  Network snapshot save error: {e}")
+    return build_network_snapshot(version, graph, routes, serves, schedules, source)
+
+
+def save_network_snapshot(directory, version, graph, routes, serves, schedules, keep=(), source=None):
+    """Write graph arrays (.npy), station/edge documents (.jsonl), the other
+    documents and meta.json into a temporary directory, then rename it into
+    place. Another worker that got there first wins; its copy is identical.
+    """
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = f"{directory}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    try:
+        save_graph_arrays(graph, tmp_dir)
+        save_graph_documents(graph, tmp_dir)
+        documents = {
+            "routes": routes,
+            "serves": serves,
+            "schedules": schedules
+        }
+        with open(os.path.join(tmp_dir, 'documents.json'), 'w') as f:
+            json.dump(documents, f)
+        meta = {
+            "version": version,
+            "directed": graph.directed,
+            "arrays": list(graph_array_names()),
+            "heuristic_scale": graph.heuristic_scale,
+            "nodes": graph.node_count,
+            "arcs": graph.arc_count,
+            "source": source,
+            "built_at": time.strftime('%Y-%m-%dT%H:%M:%S')
+        }
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        os.rename(tmp_dir, directory)
+        print(f"💾 Network v{version} saved to {directory}")
+    except OSError:
+        if not os.path.exists(os.path.join(directory, 'meta.json')):
+            raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    _remove_stale_snapshots(directory, keep)
+
+def map_network_snapshot(directory):
+    """Build a NetworkSnapshot over read-only memory-mapped graph arrays and
+    station/edge documents; routes, serves and schedules are loaded into this process
+    """
+    with open(os.path.join(directory, 'meta.json')) as f:
+        meta = json.load(f)
+    with open(os.path.join(directory, 'documents.json')) as f:
+        documents = json.load(f)
+    stations, edges, node_ids = load_graph_documents(directory)
+    graph = StationGraph(stations, edges, directed=meta['directed'],
+                         arrays=load_graph_arrays(directory),
+                         heuristic_scale=meta['heuristic_scale'], node_ids=node_ids)
+    graph.array_dir = directory
+    print(f"🗺️  Network v{meta['version']} mapped from {directory}")
+    return build_network_snapshot(meta['version'], graph, documents['routes'],
+                                  documents['serves'], documents['schedules'], meta.get('source'))
+
+def snapshot_source(directory):
+    """Collection revisions recorded in a snapshot directory (None if it has none)"""
+    try:
+        with open(os.path.join(directory, 'meta.json')) as f:
+            return json.load(f).get('source')
+    except (OSError, ValueError):
+        return None
+
+def _remove_stale_snapshots(directory, keep=()):
+    """Delete snapshots superseded more than SNAPSHOT_GRACE_SECONDS ago.
+
+    A snapshot is superseded once a newer version of the current epoch (or
+    any snapshot of it, for older epochs) exists. Mapped copies stay valid
+    after deletion; `keep` lists directories this process still serves from.
+    """
+    parent, current = os.path.split(directory)
+    epoch = current.rsplit('-v', 1)[0]
+    snapshots = []
+    for name in os.listdir(parent):
+        path = os.path.join(parent, name)
+        if name.endswith('.tmp') or '-v' not in name or not os.path.isdir(path):
+            continue
+        other_epoch, other_version = name.rsplit('-v', 1)
+        if other_version.isdigit():
+            snapshots.append((path, other_epoch, int(other_version), os.path.getmtime(path)))
+
+    now = time.time()
+    current_epoch = [(version, created) for _, e, version, created in snapshots if e == epoch]
+    for path, other_epoch, version, _ in snapshots:
+        if path in keep:
+            continue
+        newer = [created for v, created in current_epoch if other_epoch != epoch or v > version]
+        if newer and now - min(newer) > SNAPSHOT_GRACE_SECONDS:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class NetworkStore:
+    """Process-local holder of the current network snapshot.
+
+    Writes to stations, connects, routes, serves or schedules call
+    invalidate(), which bumps a version counter in Redis (or a local one when
+    Redis is down). When a worker sees a newer version it rebuilds in a
+    background thread and publishes the result by swapping one reference;
+    until then requests keep getting the previous, complete snapshot.
+
+    Each build is also written to a shared snapshot directory named after the
+    Redis epoch and version, and every worker (the builder included) memory-maps
+    it instead of loading the documents from ArangoDB. The directory records the
+    collection revisions it was built from; one that no longer matches ArangoDB
+    (data changed outside the API) is never mapped, the version is advanced
+    instead. Workers also recheck their own snapshot every
+    JOURNEY_NETWORK_CHECK_SECONDS. Shared through the page cache: the graph
+    arrays and the station/edge documents, which are decoded only when a
+    response needs them. Still per worker: node/code indexes and the flag list
+    (one entry per station), routes, serves and schedules with the RouteIndex
+    and Timetables built from them, and the per-snapshot query caches.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(NetworkStore, cls).__new__(cls)
+            cls._instance._snapshot = None
+            cls._instance._local_version = 0
+            cls._instance._rebuilding = False
+            cls._instance._failed_at = 0
+            cls._instance._checked_at = time.time()
+            cls._instance._lock = threading.Lock()
+        return cls._instance
+
+    def current_version(self):
+        """Latest network version (Redis counter, falling back to the local one)"""
+        redis_client = redis_connection.get_client()
+        if redis_client:
+            try:
+                return int(redis_client.get(VERSION_KEY) or 0)
+            except Exception as e:
+                print(f"⚠️  Network version read error: {e}")
+        return self._local_version
+
+    def get(self):
+        """Current snapshot; a stale one is returned while its replacement builds"""
+        snapshot = self._snapshot
+        version = self.current_version()
+        if snapshot is None:
+            # Nothing to serve yet: the first request builds synchronously
+            with self._lock:
+                if self._snapshot is None:
+                    self._publish(self._load(version))
+                return self._snapshot
+        if snapshot.version != version:
+            self._schedule_rebuild()
+        elif Config.JOURNEY_NETWORK_CHECK_SECONDS and \
+                time.time() - self._checked_at > Config.JOURNEY_NETWORK_CHECK_SECONDS:
+            # The rebuild thread compares revisions and returns at once when nothing changed
+            self._checked_at = time.time()
+            self._schedule_rebuild()
+        return snapshot
+
+    def snapshot_dir(self, version):
+        """Shared snapshot directory for a version, or None when snapshots can't be shared.
+
+        Sharing needs Redis: without it versions are per-process counters.
+        """
+        if not Config.JOURNEY_NETWORK_SNAPSHOTS:
+            return None
+        redis_client = redis_connection.get_client()
+        if not redis_client:
+            return None
+        try:
+            redis_client.set(EPOCH_KEY, uuid.uuid4().hex, nx=True)
+            epoch = redis_client.get(EPOCH_KEY)
+        except Exception as e:
+            print(f"⚠️  Network epoch read error: {e}")
+            return None
+        return os.path.join(Config.JOURNEY_NETWORK_DIR, f"{epoch}-v{version}")
+
+    def preload(self):
+        """Map the current version's snapshot if another worker already wrote it.
+
+        Only reads collection revisions from ArangoDB; without an up-to-date
+        snapshot the first request builds as usual.
+        """
+        version = self.current_version()
+        directory = self.snapshot_dir(version)
+        if self._snapshot is None and directory and os.path.exists(os.path.join(directory, 'meta.json')):
+            try:
+                if snapshot_source(directory) != network_source():
+                    print(f"⚠️  Network snapshot {directory} is out of date, not mapping it")
+                    return
+                with self._lock:
+                    if self._snapshot is None:
+                        self._publish(map_network_snapshot(directory))
+            except Exception as e:
+                print(f"⚠️  Network snapshot map error: {e}")
+
+    def invalidate(self):
+        """Bump the network version; every worker rebuilds in the background"""
+        self._local_version += 1
+        redis_client = redis_connection.get_client()
+        if redis_client:
+            try:
+                redis_client.incr(VERSION_KEY)
+            except Exception as e:
+                print(f"⚠️  Network version bump error: {e}")
+        if self._snapshot is not None:
+            self._schedule_rebuild()
+
+    def _publish(self, snapshot):
+        # A single reference assignment: readers see the old or the new snapshot, never a mix
+        self._snapshot = snapshot
+        print(f"🕸️  Network v{snapshot.version} published: {snapshot.graph.node_count} stations, "
+              f"{snapshot.graph.arc_count} arcs, {len(snapshot.index.routes)} routes")
+
+    def _load(self, version):
+        """Map the shared snapshot for version, or build it from ArangoDB and share it"""
+        source = network_source()
+        directory = self.snapshot_dir(version)
+        for _ in range(3):
+            if not (directory and os.path.exists(os.path.join(directory, 'meta.json'))):
+                break
+            if snapshot_source(directory) == source:
+                try:
+                    return map_network_snapshot(directory)
+                except Exception as e:
+                    print(f"⚠️  Network snapshot map error: {e}")
+                    break
+            # Written before a change made outside the API: every worker moves to a new version
+            print(f"🔄 Network snapshot {directory} is out of date")
+            version = self._advance(version)
+            directory = self.snapshot_dir(version)
+        else:
+            directory = None
+        keep = (self._snapshot.graph.array_dir,) if self._snapshot is not None else ()
+        return load_network_snapshot(version, directory=directory, keep=keep)
+
+    def _advance(self, version):
+        """Move the Redis version past `version` once, however many workers ask"""
+        self._local_version = max(self._local_version, version + 1)
+        redis_client = redis_connection.get_client()
+        if redis_client:
+            try:
+                return int(redis_client.eval(ADVANCE_VERSION_SCRIPT, 1, VERSION_KEY, version))
+            except Exception as e:
+                print(f"⚠️  Network version bump error: {e}")
+        return self._local_version
+
+    def _is_fresh(self, snapshot):
+        """Snapshot still matches ArangoDB's collection revisions"""
+        try:
+            return snapshot.source == network_source()
+        except Exception as e:
+            print(f"⚠️  Network revision check error: {e}")
+            return True
+
+    def _schedule_rebuild(self):
+        with self._lock:
+            if self._rebuilding or time.time() - self._failed_at < REBUILD_RETRY_SECONDS:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild, daemon=True).start()
+
+    def _rebuild(self):
+        """Build snapshots until one matches the latest version"""
+        try:
+            while True:
+                version = self.current_version()
+                snapshot = self._snapshot
+                if snapshot is not None and snapshot.version == version:
+                    if self._is_fresh(snapshot):
+                        break
+                    # Same version, different data: a new version also retires cached journeys
+                    version = self._advance(version)
+                self._publish(self._load(version))
+        except Exception as e:
+            self._failed_at = time.time()
+            print(f"❌ Network rebuild error: {e}")
+        finally:
+            with self._lock:
+                self._rebuilding = False
+        # A bump that landed after the last version check is not lost
+        if self._snapshot is not None and self._snapshot.version != self.current_version():
+            self._schedule_rebuild()
+
+# Singleton instance
+network = NetworkStore()
@@ -0,0 +1,127 @@
+import base64
+import json
+from app.utils.projection import projection
+
+# Sort field of each list endpoint; a persistent index on (field, _key) serves both pagination modes
+LIST_SORT_FIELDS = {
+    'stations': 'name',
+    'routes': 'route_code',
+    'vehicles': 'license_plate'
+}
+
+def ensure_list_indexes(db):
+    """Create the persistent (sort field, _key) indexes behind the list endpoints"""
+    for collection, field in LIST_SORT_FIELDS.items():
+        if db.hasCollection(collection):
+            db[collection].ensurePersistentIndex([field, '_key'], sparse=False)
+
+def encode_cursor(doc, field):
+    """Opaque cursor pointing just after doc: its sort value plus _key as tiebreak"""
+    payload = json.dumps([doc.get(field), doc['_key']], separators=(',', ':'), ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """(sort value, _key) from a cursor; raises ValueError if it was not made by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, key = json.loads(raw.decode('utf-8'))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, str):
+        raise ValueError("Invalid cursor")
+    return value, key
+
+def keyset_clause(var, field, cursor, bind_vars):
+    """AQL for the page after cursor ('' = first page); adds its bind variables.
+
+    The range filter on the sort field walks the index, the second filter only
+    breaks ties on _key, so every page costs the same whatever its depth.
+    Expects @limit to be one more than the page size (see keyset_page).
+    """
+    aql = ""
+    if cursor:
+        value, key = decode_cursor(cursor)
+        bind_vars['cursor_value'] = value
+        bind_vars['cursor_key'] = key
+        aql += (f" FILTER {var}.{field} >= @cursor_value"
+                f" FILTER {var}.{field} > @cursor_value OR {var}._key > @cursor_key")
+    return aql + f" SORT {var}.{field}, {var}._key LIMIT @limit"
+
+def keyset_page(docs, field, limit):
+    """Trim the extra row fetched by keyset_clause: (page, next cursor or None)"""
+    if len(docs) > limit:
+        docs = docs[:limit]
+        return docs, encode_cursor(docs[-1], field)
+    return docs, None
+
+def full_count(query):
+    """Rows a query matched before its last LIMIT (needs fullCount=True); read before iterating"""
+    stats = (query.response.get('extra') or {}).get('stats') or {}
+    return stats.get('fullCount')
+
+def keyset_list(db, aql, var, field, fields, bind_vars, cursor, limit, counted=True):
+    """One cursor-mode page of a list query: (docs, pagination).
+
+    aql is the query up to its filters ("FOR var IN coll FILTER ..."); the
+    keyset range, sort, limit and projection of fields are added here. With
+    counted, fullCount gives the rows from the cursor on in the same response.
+    Raises ValueError for a bad cursor or a limit below 1.
+    """
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    bind_vars['limit'] = limit + 1
+    aql += keyset_clause(var, field, cursor, bind_vars)
+    aql += " RETURN " + projection(var, fields, bind_vars)
+    result = db.AQLQuery(aql, bindVars=bind_vars, rawResults=True,
+                         batchSize=limit + 1, fullCount=counted)
+    matched = full_count(result) if counted else None
+    docs, next_cursor = keyset_page(list(result), field, limit)
+
+    pagination = {
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
+    }
+    if matched is not None:
+        pagination["remaining"] = matched - len(docs)
+        if not cursor:
+            pagination["total"] = matched
+    return docs, pagination
+
+def offset_list(db, aql, var, field, fields, bind_vars, page, limit, counted=True):
+    """One offset-mode page of a list query: (docs, pagination) with the total from fullCount"""
+    bind_vars['offset'] = (page - 1) * limit
+    bind_vars['limit'] = limit
+    aql += f" SORT {var}.{field}, {var}._key LIMIT @offset, @limit RETURN " + projection(var, fields, bind_vars)
+    result = db.AQLQuery(aql, bindVars=bind_vars, rawResults=True,
+                         batchSize=limit, fullCount=counted)
+    total = full_count(result) if counted else None
+    docs = list(result)
+
+    return docs, {
+        "page": page,
+        "limit": limit,
+        "total": total,
+        "pages": (total + limit - 1) // limit if total is not None else None
+    }
+
+def list_page(db, aql, var, field, fields, bind_vars, args, default_limit=20):
+    """One page of a list query as the request's query args ask: (docs, pagination).
+
+    ?cursor= selects keyset mode (empty for the first page), otherwise ?page=
+    pages by offset; ?limit= sets the page size and ?count=false skips the
+    total. Both modes read the total from fullCount of the same AQL call.
+    Raises ValueError for bad paging parameters.
+    """
+    try:
+        page = int(args.get('page', 1))
+        limit = int(args.get('limit', default_limit))
+    except ValueError:
+        raise ValueError("page and limit must be integers")
+    if page < 1 or limit < 1:
+        raise ValueError("page and limit must be at least 1")
+    counted = args.get('count', 'true').lower() != 'false'
+    cursor = args.get('cursor')
+    if cursor is not None:
+        return keyset_list(db, aql, var, field, fields, bind_vars, cursor, limit, counted)
+    return offset_list(db, aql, var, field, fields, bind_vars, page, limit, counted)
@@ -0,0 +1,31 @@
+import re
+
+FIELD_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+def parse_fields(value, always=('_key',)):
+    """Top-level attribute names from ?fields=a,b,c (None = whole document).
+
+    `always` are added to every projection (e.g. _key and the sort field
+    that pagination cursors are built from). Raises ValueError on names that
+    are not plain attribute names.
+    """
+    if value is None or not value.strip():
+        return None
+    fields = []
+    for name in value.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if not FIELD_NAME.match(name):
+            raise ValueError(f"Invalid field name '{name}'")
+        if name not in fields:
+            fields.append(name)
+    fields.extend(name for name in always if name not in fields)
+    return fields
+
+def projection(var, fields, bind_vars, name='fields'):
+    """AQL expression for var restricted to fields; adds the bind variable"""
+    if fields is None:
+        return var
+    bind_vars[name] = fields
+    return f"KEEP({var}, @{name})"
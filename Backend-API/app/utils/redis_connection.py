@@ -64,10 +64,14 @@ def generate_cache_key(prefix, **kwargs):
     params_hash = hashlib.md5(params_str.encode()).hexdigest()
     return f"{prefix}:{params_hash}"
 
-def cache_response(ttl=None, key_prefix=None):
+def cache_response(ttl=None, key_prefix=None, key_arg=None):
     """
     Decorator to cache Flask route responses in Redis
     
+    With key_arg (a view argument such as 'station_id') keys become
+    <prefix>:<value>:<hash> and are listed in the set <prefix>:<value>:keys,
+    so invalidate_cache_for() can drop one object's entries without KEYS.
+    
     Usage:
         @cache_response(ttl=300, key_prefix='stations')
         def get_stations():
@@ -85,6 +89,8 @@ def cache_response(ttl=None, key_prefix=None):
             
             # Generate cache key
             prefix = key_prefix or f.__name__
+            if key_arg:
+                prefix = f"{prefix}:{kwargs.get(key_arg)}"
             cache_params = {
                 'args': str(args),
                 'kwargs': str(kwargs),
@@ -113,6 +119,10 @@ def cache_response(ttl=None, key_prefix=None):
                     cache_ttl,
                     json.dumps(result)
                 )
+                if key_arg:
+                    index_key = f"{prefix}:keys"
+                    redis_client.sadd(index_key, cache_key)
+                    redis_client.expire(index_key, cache_ttl)
                 print(f"💾 Cache SET: {cache_key} (TTL: {cache_ttl}s)")
             except Exception as e:
                 print(f"⚠️  Cache write error: {e}")
@@ -141,6 +151,29 @@ def invalidate_cache(pattern):
     except Exception as e:
         print(f"⚠️  Cache invalidation error: {e}")
 
+def invalidate_cache_for(key_prefix, values):
+    """
+    Invalidate the cache_response(key_arg=...) entries of key_prefix for the
+    given values, e.g. the station_ids a bulk update touched
+    
+    Usage:
+        invalidate_cache_for('station_detail', ['ST001', 'ST002'])
+    """
+    redis_client = redis_connection.get_client()
+    if not redis_client or not values:
+        return
+    
+    try:
+        index_keys = [f"{key_prefix}:{value}:keys" for value in values]
+        pipe = redis_client.pipeline(transaction=False)
+        for index_key in index_keys:
+            pipe.smembers(index_key)
+        keys = set(index_keys).union(*pipe.execute())
+        redis_client.delete(*keys)
+        print(f"🗑️  Invalidated {len(keys) - len(index_keys)} {key_prefix} cache keys for {len(index_keys)} ids")
+    except Exception as e:
+        print(f"⚠️  Cache invalidation error: {e}")
+
 def cache_query_result(key, data, ttl=None):
     """Manually cache query result"""
     redis_client = redis_connection.get_client()
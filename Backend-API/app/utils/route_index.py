@@ -0,0 +1,277 @@
+import bisect
+import threading
+from collections import OrderedDict, defaultdict
+from collections.abc import Mapping
+from app.utils.timetable import MIN_TRANSFER_MIN, MAX_TRANSFERS, pareto_front
+
+# Rider categories priced in routes.fare
+FARE_CATEGORIES = ('adult', 'student', 'senior')
+FARE_CACHE_SIZE = 4096
+
+def route_fare(route, category='adult'):
+    """Fare of one boarding for a rider category (adult fare when the category is missing)"""
+    fare = route.get('fare') or {}
+    return float(fare.get(category, fare.get('adult')) or 0)
+
+def dominated(label, bag):
+    """Whether some (duration, fare) in bag is at least as good as label on both"""
+    return any(l[0] <= label[0] and l[1] <= label[1] for l in bag)
+
+def add_to_bag(bag, label):
+    """Insert (duration, fare, ...) label into a Pareto bag, dropping entries it dominates"""
+    bag[:] = [l for l in bag if not (label[0] <= l[0] and label[1] <= l[1])]
+    bag.append(label)
+
+class RouteIndex:
+    """Route lookups built from `serves`: station-pair -> routes, station -> stops"""
+
+    def __init__(self, routes, serves, stations=(), version=0):
+        self.version = version
+        self.routes = {r['_id']: r for r in routes}
+        # A mapping (e.g. StationGraph.stations_by_id) is used as is, without copying documents
+        self.stations = stations if isinstance(stations, Mapping) else {s['_id']: s for s in stations}
+        self.station_ids = {s.get('station_id'): sid for sid, s in self.stations.items()}
+
+        by_route = defaultdict(list)
+        for edge in serves:
+            if edge.get('_from') in self.routes:
+                by_route[edge['_from']].append(edge)
+
+        # route _id -> stops sorted by stop_order, plus the parallel order list for bisect
+        self.route_stops = {}
+        self.route_orders = {}
+        # station _id -> [(route _id, position in route_stops)]
+        self.stop_positions = defaultdict(list)
+        # station_id -> sorted [(route _id, stop_order, arrival_offset)]
+        self.station_stops = defaultdict(list)
+        for route_id, stops in by_route.items():
+            stops.sort(key=lambda e: e.get('stop_order') or 0)
+            self.route_stops[route_id] = stops
+            self.route_orders[route_id] = [e.get('stop_order') or 0 for e in stops]
+            for pos, e in enumerate(stops):
+                self.stop_positions[e['_to']].append((route_id, pos))
+                station = self.stations.get(e['_to'])
+                if station is not None:
+                    self.station_stops[station.get('station_id')].append(
+                        (route_id, e.get('stop_order') or 0, e.get('arrival_offset') or 0)
+                    )
+        for entries in self.station_stops.values():
+            entries.sort()
+
+        # (from station _id, to station _id) -> {route _id: (from_stop_order, to_stop_order)}
+        self.pairs = defaultdict(dict)
+        for route_id, stops in self.route_stops.items():
+            for a, b in zip(stops, stops[1:]):
+                self.pairs[(a['_to'], b['_to'])][route_id] = (a.get('stop_order'), b.get('stop_order'))
+
+        # (from, to, rider category, max transfers) -> Pareto journeys; lives as long as this snapshot
+        self._fare_cache = OrderedDict()
+        self._fare_lock = threading.Lock()
+
+    def leg_routes(self, from_id, to_id, allow_reverse=False):
+        """Routes covering the leg from_id -> to_id as {route _id: (stop_order, stop_order)}"""
+        routes = self.pairs.get((from_id, to_id))
+        if not routes and allow_reverse:
+            routes = {r: (b, a) for r, (a, b) in self.pairs.get((to_id, from_id), {}).items()}
+        return routes or {}
+
+    def routes_between(self, from_station, to_station):
+        """Routes visiting from_station before to_station, with the stops in between"""
+        to_stops = defaultdict(list)
+        for route_id, order, offset in self.station_stops.get(to_station, []):
+            to_stops[route_id].append((order, offset))
+
+        results = []
+        seen = set()
+        for route_id, from_order, from_offset in self.station_stops.get(from_station, []):
+            if route_id in seen:
+                continue
+            later = [t for t in to_stops.get(route_id, []) if t[0] > from_order]
+            if not later:
+                continue
+            seen.add(route_id)
+            to_order, to_offset = later[0]
+
+            orders = self.route_orders[route_id]
+            lo = bisect.bisect_left(orders, from_order)
+            hi = bisect.bisect_right(orders, to_order)
+            stops_between = [{
+                "station": self.stations.get(e['_to']),
+                "stop_order": e.get('stop_order'),
+                "arrival_offset": e.get('arrival_offset')
+            } for e in self.route_stops[route_id][lo:hi]]
+
+            results.append({
+                "route": self.routes[route_id],
+                "from_stop_order": from_order,
+                "to_stop_order": to_order,
+                "travel_time": to_offset - from_offset,
+                "stops": len(stops_between),
+                "stops_details": stops_between
+            })
+        return results
+
+    def fare_journeys(self, from_station, to_station, category='adult', max_transfers=MAX_TRANSFERS):
+        """Pareto-optimal journeys over (duration, transfers, fare), cached per rider category"""
+        key = (from_station, to_station, category, max_transfers)
+        with self._fare_lock:
+            journeys = self._fare_cache.get(key)
+            if journeys is not None:
+                self._fare_cache.move_to_end(key)
+                return journeys
+        journeys = self.pareto_journeys(from_station, to_station, category, max_transfers)
+        with self._fare_lock:
+            self._fare_cache[key] = journeys
+            while len(self._fare_cache) > FARE_CACHE_SIZE:
+                self._fare_cache.popitem(last=False)
+        return journeys
+
+    def pareto_journeys(self, from_station, to_station, category='adult', max_transfers=MAX_TRANSFERS):
+        """McRAPTOR over the routes: round k rides k vehicles, so transfers come
+        from the round and each stop keeps a Pareto bag of (duration, fare).
+
+        Duration is the expected wait (half the route's headway) plus ride time
+        from serves.arrival_offset, plus MIN_TRANSFER_MIN per change; every
+        boarding pays the route's fare for the category. A label is pruned when
+        a label from this or an earlier round at the same stop, or one already
+        at the destination, is at least as good on both.
+        """
+        source = self.station_ids.get(from_station)
+        target = self.station_ids.get(to_station)
+        if source is None or target is None or source == target:
+            return []
+
+        # label = (duration, fare, parent); parent = (previous label, route, board pos, alight pos)
+        previous = {source: [(0.0, 0.0, None)]}
+        best = defaultdict(list, {source: [(0.0, 0.0)]})
+        arrivals = []
+        for rides in range(1, max_transfers + 2):
+            # Scan each route from the first stop marked in the previous round
+            queue = {}
+            for sid in previous:
+                for route_id, pos in self.stop_positions.get(sid, ()):
+                    if pos < queue.get(route_id, len(self.route_stops[route_id])):
+                        queue[route_id] = pos
+
+            current = defaultdict(list)
+            for route_id, first in queue.items():
+                route = self.routes[route_id]
+                if route.get('status', 'active') != 'active':
+                    continue
+                fare = route_fare(route, category)
+                wait = (route.get('frequency') or 0) / 2
+                stops = self.route_stops[route_id]
+                # Route bag: (duration minus the offset at boarding, fare, boarded label, board pos)
+                bag = []
+                for pos in range(first, len(stops)):
+                    sid = stops[pos]['_to']
+                    offset = stops[pos].get('arrival_offset') or 0
+                    for base, paid, label, board in bag:
+                        arrival = (base + offset, paid)
+                        if dominated(arrival, best[target]) or dominated(arrival, best[sid]):
+                            continue
+                        add_to_bag(best[sid], arrival)
+                        add_to_bag(current[sid], (*arrival, (label, route_id, board, pos)))
+                        if sid == target:
+                            arrivals.append((rides, current[sid][-1]))
+                    for label in previous.get(sid, ()):
+                        change = MIN_TRANSFER_MIN if label[2] is not None else 0
+                        boarded = (label[0] + change + wait - offset, label[1] + fare, label, pos)
+                        if not dominated(boarded, bag):
+                            add_to_bag(bag, boarded)
+            if not current:
+                break
+            previous = current
+
+        candidates = [((label[0], rides - 1, label[1]), label) for rides, label in arrivals]
+        return [self._fare_journey(label, category) for _, label in pareto_front(candidates)]
+
+    def _fare_journey(self, label, category):
+        """Unwind a McRAPTOR label into legs, oldest ride first"""
+        legs = []
+        duration, fare = label[0], label[1]
+        while label[2] is not None:
+            previous, route_id, board, alight = label[2]
+            route = self.routes[route_id]
+            stops = self.route_stops[route_id]
+            legs.append({
+                "route": route,
+                "from_station": self.stations.get(stops[board]['_to']),
+                "to_station": self.stations.get(stops[alight]['_to']),
+                "from_stop_order": stops[board].get('stop_order'),
+                "to_stop_order": stops[alight].get('stop_order'),
+                "stops": alight - board,
+                "expected_wait": (route.get('frequency') or 0) / 2,
+                "travel_time": (stops[alight].get('arrival_offset') or 0) - (stops[board].get('arrival_offset') or 0),
+                "fare": route_fare(route, category)
+            })
+            label = previous
+        legs.reverse()
+        return {
+            "duration": duration,
+            "transfers": len(legs) - 1,
+            "fare": fare,
+            "rider_category": category,
+            "legs": legs
+        }
+
+    def label_path(self, vertices, edges, allow_reverse=False):
+        """Split a station path into route segments with the fewest transfers.
+
+        Greedy: keep riding while some route covers every leg so far; when the
+        set of common routes becomes empty, close the segment and transfer.
+        """
+        segments = []
+        current, start = None, 0
+        for i in range(len(vertices) - 1):
+            if edges[i].get('mode') == 'walk':
+                leg = {}
+            else:
+                leg = self.leg_routes(vertices[i]['_id'], vertices[i + 1]['_id'], allow_reverse)
+            if current is not None:
+                common = current.keys() & leg.keys()
+                if common:
+                    current = {r: (current[r][0], leg[r][1]) for r in common}
+                    continue
+                if not current and not leg:
+                    continue
+                segments.append(self._segment(vertices, edges, start, i, current))
+            current, start = leg, i
+        if current is not None:
+            segments.append(self._segment(vertices, edges, start, len(vertices) - 1, current))
+
+        # A walking segment between two rides is part of that transfer, not two of them
+        transfers = []
+        prev, walked = None, False
+        for segment in segments:
+            if segment['mode'] == 'walk':
+                walked = prev is not None
+                continue
+            if prev is not None:
+                transfers.append({
+                    "station": prev['to_station'],
+                    "from_route": (prev['route'] or {}).get('route_code'),
+                    "to_route": (segment['route'] or {}).get('route_code'),
+                    "walk": walked
+                })
+            prev, walked = segment, False
+        return segments, transfers
+
+    def _segment(self, vertices, edges, start, end, candidates):
+        """Build a RouteSegment for vertices[start..end]"""
+        ranked = sorted(candidates, key=lambda r: self.routes[r].get('route_code') or '')
+        route_id = ranked[0] if ranked else None
+        legs = edges[start:end]
+        walking = bool(legs) and all(e.get('mode') == 'walk' for e in legs)
+        return {
+            "mode": 'walk' if walking else 'bus',
+            "route": self.routes[route_id] if route_id else None,
+            "alternative_routes": [self.routes[r].get('route_code') for r in ranked[1:]],
+            "from_station": vertices[start],
+            "to_station": vertices[end],
+            "from_stop_order": candidates[route_id][0] if route_id else None,
+            "to_stop_order": candidates[route_id][1] if route_id else None,
+            "stops": end - start,
+            "distance": sum(e.get('distance') or 0 for e in legs),
+            "duration": sum(e.get('duration') or 0 for e in legs)
+        }
@@ -0,0 +1,85 @@
+import math
+from collections import defaultdict
+import numpy as np
+
+EARTH_RADIUS_M = 6371000
+KM_PER_DEGREE = 111.32
+
+def haversine(lat1, lng1, lat2, lng2):
+    """Vectorized Haversine distance in meters (scalars or numpy arrays, degrees)"""
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class GridIndex:
+    """Uniform lat/lng grid over station coordinates for radius and k-nearest queries"""
+
+    def __init__(self, lat, lng, cell_km=0.5):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lng = np.asarray(lng, dtype=np.float64)
+        self.cell_lat = cell_km / KM_PER_DEGREE
+        mean_lat = float(self.lat.mean()) if len(self.lat) else 0.0
+        self.cell_lng = cell_km / (KM_PER_DEGREE * max(math.cos(math.radians(mean_lat)), 0.01))
+
+        rows = np.floor(self.lat / self.cell_lat).astype(np.int64)
+        cols = np.floor(self.lng / self.cell_lng).astype(np.int64)
+        buckets = defaultdict(list)
+        for i, key in enumerate(zip(rows.tolist(), cols.tolist())):
+            buckets[key].append(i)
+        self.cells = {key: np.asarray(ids, dtype=np.int64) for key, ids in buckets.items()}
+
+    def __len__(self):
+        return len(self.lat)
+
+    def candidates(self, lat, lng, radius_km):
+        """Indices of stations in grid cells overlapping the radius"""
+        dlat = radius_km / KM_PER_DEGREE
+        dlng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+        r0, r1 = math.floor((lat - dlat) / self.cell_lat), math.floor((lat + dlat) / self.cell_lat)
+        c0, c1 = math.floor((lng - dlng) / self.cell_lng), math.floor((lng + dlng) / self.cell_lng)
+
+        # Bounding box bigger than the populated grid: a single vectorized scan is cheaper
+        if (r1 - r0 + 1) * (c1 - c0 + 1) >= len(self.cells):
+            return np.arange(len(self.lat)), True
+
+        found = [self.cells[(r, c)]
+                 for r in range(r0, r1 + 1)
+                 for c in range(c0, c1 + 1)
+                 if (r, c) in self.cells]
+        if not found:
+            return np.zeros(0, dtype=np.int64), False
+        return np.concatenate(found), False
+
+    def within(self, lat, lng, radius_km, limit=None):
+        """Stations within radius_km, nearest first: (indices, distances_km)"""
+        ids, _ = self.candidates(lat, lng, radius_km)
+        return self._rank(lat, lng, ids, radius_km, limit)
+
+    def nearest(self, lat, lng, k, max_radius_km=None):
+        """k nearest stations, optionally bounded by max_radius_km"""
+        if k <= 0 or not len(self.lat):
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        radius = max(self.cell_lat * KM_PER_DEGREE, 0.1)
+        while True:
+            if max_radius_km is not None:
+                radius = min(radius, max_radius_km)
+            ids, full_scan = self.candidates(lat, lng, radius)
+            found, dist = self._rank(lat, lng, ids, radius, k)
+            # Every station outside the radius is farther than those returned
+            if len(found) >= k or full_scan or radius == max_radius_km:
+                if full_scan and max_radius_km is None:
+                    found, dist = self._rank(lat, lng, ids, None, k)
+                return found, dist
+            radius *= 2
+
+    def _rank(self, lat, lng, ids, radius_km, limit):
+        """Exact distances for candidate ids, filtered and sorted"""
+        dist = haversine(lat, lng, self.lat[ids], self.lng[ids]) / 1000
+        if radius_km is not None:
+            mask = dist <= radius_km
+            ids, dist = ids[mask], dist[mask]
+        order = np.argsort(dist, kind='stable')
+        if limit is not None:
+            order = order[:limit]
+        return ids[order], dist[order]
@@ -0,0 +1,632 @@
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence
+from functools import cached_property
+import numpy as np
+from app.config import Config
+from app.utils.db_connection import db_connection
+from app.utils.hub_labels import hub_labels
+from app.utils.spatial_index import GridIndex, haversine
+
+METRICS = ('duration', 'distance')
+ALGORITHMS = ('auto', 'dijkstra', 'astar', 'bidirectional', 'hub_labels')
+# stations.facilities flags and stations.status values usable as routing constraints
+FACILITIES = ('waiting_area', 'wifi', 'toilet', 'atm', 'wheelchair_accessible')
+STATUSES = ('active', 'maintenance', 'inactive')
+# Flat arrays of a StationGraph (plus weights_<metric>), shareable via memory-mapped files
+GRAPH_ARRAYS = ('offsets', 'targets', 'arc_edges', 'rev_offsets', 'rev_sources', 'rev_arcs',
+                'lat', 'lng', 'flags')
+ISOCHRONE_BUCKET_MIN = 5
+ISOCHRONE_CACHE_SIZE = 4096
+
+def dijkstra_costs(offsets, targets, weights, source, goals=None, max_cost=None):
+    """One-to-many Dijkstra on raw CSR arrays: settled node -> cost.
+
+    Stops once every node in `goals` is settled, or when the frontier passes
+    `max_cost`. Works on plain arrays so it can run in worker processes.
+    """
+    dist = {source: 0.0}
+    settled = {}
+    remaining = set(goals) if goals is not None else None
+    heap = [(0.0, source)]
+
+    while heap:
+        d, u = heapq.heappop(heap)
+        if u in settled:
+            continue
+        if max_cost is not None and d > max_cost:
+            break
+        settled[u] = d
+        if remaining is not None:
+            remaining.discard(u)
+            if not remaining:
+                break
+        lo, hi = offsets[u], offsets[u + 1]
+        for v, w in zip(targets[lo:hi].tolist(), weights[lo:hi].tolist()):
+            nd = d + w
+            if nd < dist.get(v, float('inf')):
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return settled
+
+
+def walk_cost(distance_km, metric='duration'):
+    """Walking leg expressed in the metric's unit (minutes or meters)"""
+    if metric == 'distance':
+        return distance_km * 1000
+    return distance_km / Config.JOURNEY_WALK_SPEED_KMH * 60
+
+def station_flags(station):
+    """Constraint bits of a station: one bit per *missing* facility, one per status.
+
+    A query mask sets the bits of the facilities it requires and the statuses it
+    avoids, so a station is blocked exactly when flags & mask != 0.
+    """
+    facilities = station.get('facilities') or {}
+    flags = 0
+    for bit, name in enumerate(FACILITIES):
+        if not facilities.get(name):
+            flags |= 1 << bit
+    status = station.get('status', 'active')
+    if status in STATUSES:
+        flags |= 1 << (len(FACILITIES) + STATUSES.index(status))
+    return flags
+
+def constraint_mask(required_facilities=(), avoid_status=()):
+    """Query mask for station_flags; raises ValueError on unknown names"""
+    mask = 0
+    for name in required_facilities:
+        if name not in FACILITIES:
+            raise ValueError(f"Unknown facility '{name}', expected one of {list(FACILITIES)}")
+        mask |= 1 << FACILITIES.index(name)
+    for status in avoid_status:
+        if status not in STATUSES:
+            raise ValueError(f"Unknown status '{status}', expected one of {list(STATUSES)}")
+        mask |= 1 << (len(FACILITIES) + STATUSES.index(status))
+    return mask
+
+def budget_bucket(budget):
+    """Round a time budget up to its isochrone cache bucket"""
+    return math.ceil(budget / ISOCHRONE_BUCKET_MIN) * ISOCHRONE_BUCKET_MIN
+
+
+class MappedDocuments(Sequence):
+    """Read-only list of JSON documents stored one per line in a memory-mapped file.
+
+    A document is decoded when accessed and not kept, so the file's pages in
+    the page cache are the only resident copy however many workers map it.
+    """
+
+    def __init__(self, directory, name):
+        self.offsets = np.load(os.path.join(directory, f"{name}_offsets.npy"), mmap_mode='r')
+        with open(os.path.join(directory, f"{name}.jsonl"), 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b''
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError('document index out of range')
+        return json.loads(self._data[int(self.offsets[i]):int(self.offsets[i + 1])])
+
+
+class StationsById(Mapping):
+    """A graph's station documents keyed by _id, read through to graph.stations"""
+
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __getitem__(self, station_id):
+        return self._graph.stations[self._graph.node_index[station_id]]
+
+    def __contains__(self, station_id):
+        return station_id in self._graph.node_index
+
+    def __iter__(self):
+        return iter(self._graph.node_index)
+
+    def __len__(self):
+        return len(self._graph.node_index)
+
+
+class StationGraph:
+    """Read-only CSR adjacency of the `connects` graph, keyed by station _id"""
+
+    def __init__(self, stations, edges, directed=False, arrays=None, heuristic_scale=None, node_ids=None):
+        # Mapped documents stay in their file; anything else is copied into a list
+        self.stations = stations if isinstance(stations, MappedDocuments) else list(stations)
+        self.edges = edges if isinstance(edges, MappedDocuments) else list(edges)
+        self.directed = directed
+
+        # Node index <-> station document; node_ids = [(_id, station_id)] per node
+        # saves decoding every mapped document just to index them
+        if node_ids is None:
+            node_ids = [(s['_id'], s.get('station_id')) for s in self.stations]
+        self.node_index = {sid: i for i, (sid, _) in enumerate(node_ids)}
+        self.code_index = {code: i for i, (_, code) in enumerate(node_ids)}
+
+        if arrays is None:
+            self._build_arrays()
+        else:
+            # Arrays mapped from a snapshot file (see GRAPH_ARRAYS)
+            for name in GRAPH_ARRAYS:
+                setattr(self, name, arrays[name])
+            self.weights = {metric: arrays[f'weights_{metric}'] for metric in METRICS}
+            self.heuristic_scale = dict(heuristic_scale)
+        # List copy of the constraint bits for the search loops
+        self._flag_list = self.flags.tolist()
+
+        # (source, budget bucket) -> {node: minutes}; lives as long as this snapshot
+        self._reach_cache = OrderedDict()
+        self._reach_lock = threading.Lock()
+
+        # metric -> HubLabels, attached once precomputed labels are available
+        self.hub_labels = {}
+        # Snapshot directory the arrays are mapped from (None = built in this process)
+        self.array_dir = None
+
+    def _build_arrays(self):
+        """Build the CSR, coordinate, flag and weight arrays from the documents"""
+        # Arcs (tail, head, edge). Undirected mode mirrors the old `ANY` traversal.
+        tails, heads, arc_edges = [], [], []
+        for k, edge in enumerate(self.edges):
+            u = self.node_index.get(edge.get('_from'))
+            v = self.node_index.get(edge.get('_to'))
+            if u is None or v is None:
+                continue
+            tails.append(u)
+            heads.append(v)
+            arc_edges.append(k)
+            if not self.directed:
+                tails.append(v)
+                heads.append(u)
+                arc_edges.append(k)
+
+        n = len(self.stations)
+        tails = np.asarray(tails, dtype=np.int32)
+        order = np.argsort(tails, kind='stable')
+
+        self.offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tails, minlength=n), out=self.offsets[1:])
+        self.targets = np.asarray(heads, dtype=np.int32)[order]
+        self.arc_edges = np.asarray(arc_edges, dtype=np.int32)[order]
+
+        # Reverse CSR: arcs entering each node (tail + forward arc index)
+        arc_tails = tails[order]
+        rev_order = np.argsort(self.targets, kind='stable')
+        self.rev_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.targets, minlength=n), out=self.rev_offsets[1:])
+        self.rev_sources = arc_tails[rev_order]
+        self.rev_arcs = rev_order.astype(np.int64)
+
+        # Station coordinates (degrees) from stations.location
+        self.lat = np.array(
+            [float((s.get('location') or {}).get('latitude') or 0) for s in self.stations],
+            dtype=np.float64
+        )
+        self.lng = np.array(
+            [float((s.get('location') or {}).get('longitude') or 0) for s in self.stations],
+            dtype=np.float64
+        )
+        # Per-station constraint bits (see station_flags)
+        self.flags = np.array([station_flags(s) for s in self.stations], dtype=np.uint16)
+        arc_geodesic = haversine(
+            self.lat[arc_tails], self.lng[arc_tails],
+            self.lat[self.targets], self.lng[self.targets]
+        )
+
+        self.weights = {}
+        self.heuristic_scale = {}
+        for metric in METRICS:
+            edge_weights = np.array(
+                [max(float(e.get(metric) or 0), 0.0) for e in self.edges],
+                dtype=np.float64
+            )
+            self.weights[metric] = edge_weights[self.arc_edges]
+
+            # Smallest weight per meter of straight line over all arcs. Scaling the
+            # great-circle distance by it gives a consistent A* heuristic for any metric.
+            mask = arc_geodesic > 0
+            ratios = self.weights[metric][mask] / arc_geodesic[mask]
+            self.heuristic_scale[metric] = float(ratios.min()) if len(ratios) else 0.0
+
+    @property
+    def arrays(self):
+        """Every flat array of the graph by name, as stored in snapshot files"""
+        arrays = {name: getattr(self, name) for name in GRAPH_ARRAYS}
+        arrays.update({f'weights_{metric}': self.weights[metric] for metric in METRICS})
+        return arrays
+
+    @property
+    def node_count(self):
+        return len(self.stations)
+
+    @property
+    def stations_by_id(self):
+        """Station documents keyed by _id, without copying them"""
+        return StationsById(self)
+
+    @property
+    def arc_count(self):
+        return len(self.targets)
+
+    @cached_property
+    def fingerprint(self):
+        """Content hash of nodes, arcs and weights (identifies precomputed indexes)"""
+        digest = hashlib.sha1()
+        digest.update(b'directed' if self.directed else b'any')
+        digest.update('\n'.join(self.node_index).encode('utf-8'))
+        for array in (self.offsets, self.targets, self.weights['duration'], self.weights['distance']):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    @cached_property
+    def spatial_index(self):
+        """Grid index over station coordinates, built on first geo query"""
+        return GridIndex(self.lat, self.lng)
+
+    def allowed(self, u, mask=0):
+        """Whether node u passes a constraint mask"""
+        return not self._flag_list[u] & mask
+
+    def node(self, station_id):
+        """Resolve a station_id (e.g. 'ST001') to its node index"""
+        return self.code_index.get(station_id)
+
+    def neighbors(self, u, metric='duration'):
+        """Yield (arc, head, weight) for every arc leaving node u"""
+        lo, hi = self.offsets[u], self.offsets[u + 1]
+        return zip(
+            range(lo, hi),
+            self.targets[lo:hi].tolist(),
+            self.weights[metric][lo:hi].tolist()
+        )
+
+    def heuristic(self, target, metric='duration'):
+        """Lower bound on the cost from every node to target, in one numpy pass"""
+        scale = self.heuristic_scale[metric]
+        if scale <= 0:
+            return None
+        bound = haversine(self.lat[target], self.lng[target], self.lat, self.lng) * scale
+        return bound.tolist()
+
+    def shortest_path(self, source, target, metric='duration', algorithm='auto', mask=0):
+        """Single-pair search with the selected algorithm.
+
+        'auto' uses precomputed hub labels when they are ready, else A*
+        (also when the label path walk fails). Labels ignore constraints, so
+        a non-zero mask always searches.
+        The result's 'algorithm' says which one actually ran.
+        """
+        use_labels = algorithm in ('auto', 'hub_labels') and not mask
+        labels = hub_labels.get(self, metric) if use_labels else None
+        path = labels.path(self, source, target, metric) if labels is not None else None
+        if path is not None or (labels is not None and labels.distance(source, target) is None):
+            algorithm = 'hub_labels'
+        elif algorithm == 'dijkstra':
+            path = self.dijkstra(source, target, metric, mask)
+        elif algorithm == 'bidirectional':
+            path = self.bidirectional(source, target, metric, mask)
+        else:
+            path, algorithm = self.astar(source, target, metric, mask), 'astar'
+        if path is not None:
+            path['algorithm'] = algorithm
+        return path
+
+    def reverse_neighbors(self, u, metric='duration'):
+        """Yield (arc, tail, weight) for every arc entering node u"""
+        lo, hi = self.rev_offsets[u], self.rev_offsets[u + 1]
+        arcs = self.rev_arcs[lo:hi]
+        return zip(
+            arcs.tolist(),
+            self.rev_sources[lo:hi].tolist(),
+            self.weights[metric][arcs].tolist()
+        )
+
+    def dijkstra(self, source, target, metric='duration', mask=0):
+        """Single-pair Dijkstra over the CSR arrays"""
+        return self._search(source, target, metric, None, mask=mask)
+
+    def astar(self, source, target, metric='duration', mask=0):
+        """A* guided by the great-circle lower bound to target"""
+        return self._search(source, target, metric, self.heuristic(target, metric), mask=mask)
+
+    def bidirectional(self, source, target, metric='duration', mask=0):
+        """Bidirectional Dijkstra: forward over out-arcs from source, backward over
+        in-arcs from target, stopping once the two heap tops cannot beat the best
+        meeting point found so far.
+        """
+        inf = float('inf')
+        # side 0 = forward, side 1 = backward
+        dist = ({source: 0.0}, {target: 0.0})
+        parent = ({}, {})
+        settled = (set(), set())
+        heaps = ([(0.0, source)], [(0.0, target)])
+        expand = (self.neighbors, self.reverse_neighbors)
+        flags = self._flag_list
+        best, meet = (0.0, source) if source == target else (inf, None)
+
+        while heaps[0] and heaps[1] and heaps[0][0][0] + heaps[1][0][0] < best:
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            d, u = heapq.heappop(heaps[side])
+            if u in settled[side]:
+                continue
+            settled[side].add(u)
+            own, other = dist[side], dist[1 - side]
+            for arc, v, w in expand[side](u, metric):
+                if flags[v] & mask:
+                    continue
+                nd = d + w
+                if nd < own.get(v, inf):
+                    own[v] = nd
+                    parent[side][v] = (u, arc)
+                    heapq.heappush(heaps[side], (nd, v))
+                if v in other and nd + other[v] < best:
+                    best, meet = nd + other[v], v
+
+        if meet is None:
+            return None
+        path = self._unwind(parent[0], source, meet, dist[0][meet], len(settled[0]) + len(settled[1]))
+        # Backward parents point towards target
+        u = meet
+        while u != target:
+            v, arc = parent[1][u]
+            path['nodes'].append(v)
+            path['arcs'].append(arc)
+            u = v
+        path['cost'] = best
+        return path
+
+    def snap(self, lat, lng, k, max_radius_km=None, mask=0):
+        """k nearest stations passing mask to a coordinate as {node: distance_km}"""
+        if not mask:
+            ids, distances = self.spatial_index.nearest(lat, lng, k, max_radius_km=max_radius_km)
+            return dict(zip(ids.tolist(), distances.tolist()))
+        ids, distances = self.spatial_index.within(lat, lng, max_radius_km or 2)
+        keep = (self.flags[ids] & mask) == 0
+        return dict(zip(ids[keep][:k].tolist(), distances[keep][:k].tolist()))
+
+    def multi_search(self, sources, targets, metric='duration', mask=0):
+        """One Dijkstra from many sources to many targets.
+
+        sources/targets map node -> access/egress cost already in metric units;
+        the result is the cheapest source -> target path including both, with
+        'source' and 'target' set to the stations actually used.
+        """
+        inf = float('inf')
+        dist = dict(sources)
+        parent = {}
+        settled = set()
+        heap = [(c, u) for u, c in sources.items()]
+        heapq.heapify(heap)
+        best, best_target = inf, None
+        flags = self._flag_list
+
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d >= best:
+                break
+            if u in settled:
+                continue
+            settled.add(u)
+            if u in targets and d + targets[u] < best:
+                best, best_target = d + targets[u], u
+            for arc, v, w in self.neighbors(u, metric):
+                if flags[v] & mask:
+                    continue
+                nd = d + w
+                if nd < dist.get(v, inf):
+                    dist[v] = nd
+                    parent[v] = (u, arc)
+                    heapq.heappush(heap, (nd, v))
+
+        if best_target is None:
+            return None
+        nodes, arcs = [best_target], []
+        while nodes[-1] in parent:
+            u, arc = parent[nodes[-1]]
+            nodes.append(u)
+            arcs.append(arc)
+        nodes.reverse()
+        arcs.reverse()
+        return {
+            'cost': best,
+            'nodes': nodes,
+            'arcs': arcs,
+            'expanded': len(settled),
+            'source': nodes[0],
+            'target': best_target
+        }
+
+    def _search(self, source, target, metric, h, banned_nodes=None, banned_arcs=None, mask=0):
+        """Best-first search; h=None is plain Dijkstra, mask skips blocked stations"""
+        flags = self._flag_list
+        dist = {source: 0.0}
+        parent = {}
+        settled = set()
+        heap = [(h[source] if h else 0.0, source)]
+
+        while heap:
+            _, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            settled.add(u)
+            if u == target:
+                break
+            d = dist[u]
+            for arc, v, w in self.neighbors(u, metric):
+                if flags[v] & mask:
+                    continue
+                if banned_nodes and v in banned_nodes:
+                    continue
+                if banned_arcs and arc in banned_arcs:
+                    continue
+                nd = d + w
+                if nd < dist.get(v, float('inf')):
+                    dist[v] = nd
+                    parent[v] = (u, arc)
+                    heapq.heappush(heap, (nd + h[v] if h else nd, v))
+
+        if target not in settled:
+            return None
+        return self._unwind(parent, source, target, dist[target], len(settled))
+
+    def k_shortest_paths(self, source, target, k, metric='duration', mask=0):
+        """Yen's algorithm: up to k loopless paths in increasing cost"""
+        first = self.dijkstra(source, target, metric, mask)
+        if first is None:
+            return []
+        weights = self.weights[metric]
+        paths = [first]
+        seen = {tuple(first['nodes'])}
+        candidates = []
+
+        while len(paths) < k:
+            prev = paths[-1]
+            for i in range(len(prev['nodes']) - 1):
+                spur = prev['nodes'][i]
+                root_nodes = prev['nodes'][:i + 1]
+
+                # Block the next hop of every accepted path sharing this root
+                next_hops = {p['nodes'][i + 1] for p in paths
+                             if len(p['nodes']) > i + 1 and p['nodes'][:i + 1] == root_nodes}
+                banned_arcs = {arc for arc, v, _ in self.neighbors(spur, metric) if v in next_hops}
+
+                spur_path = self._search(spur, target, metric, None,
+                                         set(root_nodes[:-1]), banned_arcs, mask)
+                if spur_path is None:
+                    continue
+                nodes = root_nodes[:-1] + spur_path['nodes']
+                if tuple(nodes) in seen:
+                    continue
+                seen.add(tuple(nodes))
+                arcs = prev['arcs'][:i] + spur_path['arcs']
+                cost = float(sum(weights[a] for a in arcs))
+                heapq.heappush(candidates, (cost, len(seen), {
+                    'cost': cost,
+                    'nodes': nodes,
+                    'arcs': arcs,
+                    'expanded': spur_path['expanded']
+                }))
+            if not candidates:
+                break
+            paths.append(heapq.heappop(candidates)[2])
+        return paths
+
+    def costs_from(self, source, metric='duration', goals=None, max_cost=None):
+        """One-to-many costs from source (see dijkstra_costs)"""
+        return dijkstra_costs(self.offsets, self.targets, self.weights[metric],
+                              source, goals, max_cost)
+
+    def reachable(self, source, budget):
+        """Nodes reachable from source within budget minutes: {node: minutes}.
+
+        The bounded search runs once per (source, budget rounded up to
+        ISOCHRONE_BUCKET_MIN) and is cached; smaller budgets filter the result.
+        """
+        bucket = budget_bucket(budget)
+        costs = self.cached_reachable(source, bucket)
+        if costs is None:
+            costs = self.costs_from(source, 'duration', max_cost=bucket)
+            self.cache_reachable(source, bucket, costs)
+        return {u: c for u, c in costs.items() if c <= budget}
+
+    def cached_reachable(self, source, bucket):
+        """Cached bounded search result for (source, bucket), or None"""
+        with self._reach_lock:
+            costs = self._reach_cache.get((source, bucket))
+            if costs is not None:
+                self._reach_cache.move_to_end((source, bucket))
+            return costs
+
+    def cache_reachable(self, source, bucket, costs):
+        """Store a bounded search result (also used by the bulk worker pool)"""
+        with self._reach_lock:
+            self._reach_cache[(source, bucket)] = costs
+            while len(self._reach_cache) > ISOCHRONE_CACHE_SIZE:
+                self._reach_cache.popitem(last=False)
+
+    def _unwind(self, parent, source, target, cost, expanded):
+        """Rebuild node/arc lists from the parent map"""
+        nodes, arcs = [target], []
+        while nodes[-1] != source:
+            u, arc = parent[nodes[-1]]
+            nodes.append(u)
+            arcs.append(arc)
+        nodes.reverse()
+        arcs.reverse()
+        return {
+            'cost': cost,
+            'nodes': nodes,
+            'arcs': arcs,
+            'expanded': expanded
+        }
+
+    def path_payload(self, path):
+        """Turn a search result into station/edge documents and totals"""
+        edges = [self.edges[int(self.arc_edges[a])] for a in path['arcs']]
+        return {
+            'vertices': [self.stations[u] for u in path['nodes']],
+            'edges': edges,
+            'total_distance': sum(e.get('distance') or 0 for e in edges),
+            'total_duration': sum(e.get('duration') or 0 for e in edges)
+        }
+
+
+def graph_array_names():
+    """File names (without .npy) of every array written by save_graph_arrays"""
+    return GRAPH_ARRAYS + tuple(f'weights_{metric}' for metric in METRICS)
+
+def save_graph_arrays(graph, directory):
+    """Write each graph array to <directory>/<name>.npy"""
+    for name, array in graph.arrays.items():
+        with open(os.path.join(directory, f"{name}.npy"), 'wb') as f:
+            np.save(f, np.ascontiguousarray(array))
+
+def load_graph_arrays(directory):
+    """Memory-map the arrays written by save_graph_arrays, read-only"""
+    return {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+            for name in graph_array_names()}
+
+def save_graph_documents(graph, directory):
+    """Write station and edge documents as <name>.jsonl plus <name>_offsets.npy,
+    and the (_id, station_id) of every node as nodes.json
+    """
+    for name, docs in (('stations', graph.stations), ('edges', graph.edges)):
+        offsets = [0]
+        with open(os.path.join(directory, f"{name}.jsonl"), 'wb') as f:
+            for doc in docs:
+                line = json.dumps(doc, ensure_ascii=False).encode('utf-8') + b'\n'
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+        with open(os.path.join(directory, f"{name}_offsets.npy"), 'wb') as f:
+            np.save(f, np.asarray(offsets, dtype=np.int64))
+    with open(os.path.join(directory, 'nodes.json'), 'w') as f:
+        json.dump([(s['_id'], s.get('station_id')) for s in graph.stations], f)
+
+def load_graph_documents(directory):
+    """(stations, edges, node_ids) written by save_graph_documents; documents stay mapped"""
+    with open(os.path.join(directory, 'nodes.json')) as f:
+        node_ids = [tuple(pair) for pair in json.load(f)]
+    return MappedDocuments(directory, 'stations'), MappedDocuments(directory, 'edges'), node_ids
+
+
+def load_station_graph(db=None):
+    """Load stations and connects from ArangoDB into a StationGraph"""
+    db = db or db_connection.get_db()
+    # Sorted so node numbering (and the graph fingerprint) is stable across reloads
+    stations = list(db.AQLQuery("FOR s IN stations SORT s._key RETURN s", rawResults=True, batchSize=1000))
+    edges = list(db.AQLQuery("FOR c IN connects SORT c._key RETURN c", rawResults=True, batchSize=1000))
+    return StationGraph(stations, edges, directed=Config.JOURNEY_DIRECTED_EDGES)
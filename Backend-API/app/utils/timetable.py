@@ -0,0 +1,312 @@
+from bisect import bisect_right
+from datetime import datetime
+import numpy as np
+from app.utils.db_connection import db_connection
+
+DAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+# Minutes needed to change vehicles at a stop
+MIN_TRANSFER_MIN = 2
+# Connections converted to Python lists per scan step
+SCAN_BLOCK = 4096
+# Profile queries: default transfer limit, default range window, and how far before an arrive-by time to look
+MAX_TRANSFERS = 4
+PROFILE_WINDOW_MIN = 60
+ARRIVE_BY_WINDOW_MIN = 180
+
+def parse_time(value):
+    """'HH:MM' -> minutes after midnight (None -> current time)"""
+    if not value:
+        now = datetime.now()
+        return now.hour * 60 + now.minute
+    hours, minutes = str(value).split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+def format_time(minutes):
+    """Minutes after midnight -> 'HH:MM' (wraps past midnight)"""
+    minutes = int(round(minutes)) % (24 * 60)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def today():
+    """Current day name as used in schedules.day_of_week"""
+    return DAYS[datetime.now().weekday()]
+
+
+class Timetable:
+    """Connection Scan timetable for one service day, held in flat arrays.
+
+    Trips come from each active route's `frequency` over its
+    `operating_hours`, plus the explicit `schedules.departure_time` entries
+    for that day; `serves.arrival_offset` places every trip at each stop.
+    """
+
+    def __init__(self, index, schedules, day, version=0):
+        self.day = day
+        self.version = version
+        self.index = index
+
+        # Stops = stations served by at least one route
+        self.stop_ids = sorted({e['_to'] for stops in index.route_stops.values() for e in stops})
+        self.stop_index = {sid: i for i, sid in enumerate(self.stop_ids)}
+        self.code_index = {
+            index.stations[sid].get('station_id'): i
+            for i, sid in enumerate(self.stop_ids) if sid in index.stations
+        }
+
+        scheduled = {}
+        for schedule in schedules:
+            if day in (schedule.get('day_of_week') or []) and schedule.get('status') != 'cancelled':
+                scheduled.setdefault(schedule.get('route_id'), set()).add(parse_time(schedule['departure_time']))
+
+        self.trip_routes = []
+        self.trip_starts = []
+        dep_stop, arr_stop, dep_time, arr_time, trip_ids, hops = [], [], [], [], [], []
+        for route_id, stops in index.route_stops.items():
+            route = index.routes[route_id]
+            if route.get('status', 'active') != 'active' or len(stops) < 2:
+                continue
+            for start in sorted(self._trip_starts(route) | scheduled.get(route.get('route_id'), set())):
+                trip = len(self.trip_routes)
+                self.trip_routes.append(route_id)
+                self.trip_starts.append(start)
+                for hop, (a, b) in enumerate(zip(stops, stops[1:])):
+                    dep = start + (a.get('arrival_offset') or 0)
+                    dep_stop.append(self.stop_index[a['_to']])
+                    arr_stop.append(self.stop_index[b['_to']])
+                    dep_time.append(dep)
+                    arr_time.append(max(start + (b.get('arrival_offset') or 0), dep))
+                    trip_ids.append(trip)
+                    hops.append(hop)
+
+        order = np.lexsort((np.asarray(arr_time), np.asarray(dep_time)))
+        self.dep_stop = np.asarray(dep_stop, dtype=np.int32)[order]
+        self.arr_stop = np.asarray(arr_stop, dtype=np.int32)[order]
+        self.dep_time = np.asarray(dep_time, dtype=np.int32)[order]
+        self.arr_time = np.asarray(arr_time, dtype=np.int32)[order]
+        self.trip = np.asarray(trip_ids, dtype=np.int32)[order]
+        self.hop = np.asarray(hops, dtype=np.int32)[order]
+        # Profile scan order: latest departure first, later hops of a trip before earlier ones
+        self.profile_order = np.lexsort((self.hop, self.arr_time, self.dep_time))[::-1]
+
+    @staticmethod
+    def _trip_starts(route):
+        """Departures from the first stop every `frequency` minutes within operating hours"""
+        frequency = int(route.get('frequency') or 0)
+        hours = route.get('operating_hours') or {}
+        if frequency <= 0 or not hours.get('start') or not hours.get('end'):
+            return set()
+        start, end = parse_time(hours['start']), parse_time(hours['end'])
+        if end < start:
+            end += 24 * 60
+        return set(range(start, end + 1, frequency))
+
+    @property
+    def connection_count(self):
+        return len(self.dep_time)
+
+    def stop(self, station_id):
+        """Resolve a station_id to its stop index"""
+        return self.code_index.get(station_id)
+
+    def earliest_arrival(self, source, target, depart):
+        """Connection Scan: earliest arrival at target leaving source at or after depart"""
+        n = len(self.stop_ids)
+        inf = float('inf')
+        ready = [inf] * n        # earliest time a passenger can board at each stop
+        arrival = [inf] * n
+        rides = [0] * n
+        reached_by = [None] * n  # (boarding connection, alighting connection)
+        boarded = {}             # trip -> (boarding connection, rides so far)
+        ready[source] = arrival[source] = depart
+
+        i = int(np.searchsorted(self.dep_time, depart, side='left'))
+        total = self.connection_count
+        while i < total:
+            block = slice(i, min(i + SCAN_BLOCK, total))
+            for k, dep, arr, u, v, trip in zip(
+                range(block.start, block.stop),
+                self.dep_time[block].tolist(), self.arr_time[block].tolist(),
+                self.dep_stop[block].tolist(), self.arr_stop[block].tolist(),
+                self.trip[block].tolist()
+            ):
+                if dep > arrival[target]:
+                    i = total
+                    break
+                entry = boarded.get(trip)
+                if entry is None:
+                    if ready[u] > dep:
+                        continue
+                    entry = boarded[trip] = (k, rides[u] + 1)
+                if arr < arrival[v]:
+                    arrival[v] = arr
+                    ready[v] = arr + MIN_TRANSFER_MIN
+                    rides[v] = entry[1]
+                    reached_by[v] = (entry[0], k)
+            else:
+                i = block.stop
+
+        if arrival[target] == inf:
+            return None
+        return self._journey(source, target, depart, arrival[target], reached_by)
+
+    def profile(self, source, target, depart_from, depart_to=None, arrive_by=None,
+                max_transfers=MAX_TRANSFERS):
+        """Profile Connection Scan: every Pareto-optimal (departure, arrival,
+        transfers) journey leaving source within [depart_from, depart_to].
+
+        One pass over the connections by decreasing departure. Each stop keeps
+        (departure, best arrival per ride count) entries and each trip the best
+        arrival per ride count when staying seated, so every departure in the
+        window is answered by the same scan. With arrive_by, connections
+        arriving later are skipped and only (departure, transfers) are ranked.
+        """
+        rides = max_transfers + 1
+        inf = float('inf')
+        unreachable = (inf,) * rides
+        n = len(self.stop_ids)
+        neg_deps = [[] for _ in range(n)]  # per stop: -departure of each entry (ascending)
+        arrivals = [[] for _ in range(n)]  # per stop entry: best arrival using <= r + 1 rides
+        pointers = [[] for _ in range(n)]  # per stop entry: (boarding, alighting connection) per r
+        trips = {}                         # trip -> (arrival per r, alighting connection per r)
+
+        total = self.connection_count
+        first = total - int(np.searchsorted(self.dep_time, arrive_by, side='right')) if arrive_by is not None else 0
+        last = total - int(np.searchsorted(self.dep_time, depart_from, side='left'))
+        for start in range(first, last, SCAN_BLOCK):
+            block = self.profile_order[start:min(start + SCAN_BLOCK, last)]
+            for k, dep, arr, u, v, trip in zip(
+                block.tolist(),
+                self.dep_time[block].tolist(), self.arr_time[block].tolist(),
+                self.dep_stop[block].tolist(), self.arr_stop[block].tolist(),
+                self.trip[block].tolist()
+            ):
+                if arrive_by is not None and arr > arrive_by:
+                    continue
+                best, exits = trips.get(trip, (unreachable, (None,) * rides))
+                best, exits = list(best), list(exits)
+                if v == target:
+                    # Alight at the target
+                    for r in range(rides):
+                        if arr < best[r]:
+                            best[r], exits[r] = arr, k
+                else:
+                    # Alight and transfer: first entry at v leaving after the change time
+                    i = bisect_right(neg_deps[v], -(arr + MIN_TRANSFER_MIN)) - 1
+                    if i >= 0:
+                        onward = arrivals[v][i]
+                        for r in range(1, rides):
+                            if onward[r - 1] < best[r]:
+                                best[r], exits[r] = onward[r - 1], k
+                trips[trip] = (best, exits)
+                if u == target or best[-1] == inf:
+                    continue
+                if u == source and depart_to is not None and dep > depart_to:
+                    # Keep later departures from shadowing the window's own journeys
+                    continue
+
+                # Board here: merge into u's profile if it improves any ride count
+                if arrivals[u]:
+                    previous, previous_ptr = arrivals[u][-1], pointers[u][-1]
+                    if all(b >= p for b, p in zip(best, previous)):
+                        continue
+                else:
+                    previous, previous_ptr = unreachable, (None,) * rides
+                merged = tuple(min(b, p) for b, p in zip(best, previous))
+                merged_ptr = tuple((k, exits[r]) if best[r] < previous[r] else previous_ptr[r]
+                                   for r in range(rides))
+                if neg_deps[u] and neg_deps[u][-1] == -dep:
+                    arrivals[u][-1], pointers[u][-1] = merged, merged_ptr
+                else:
+                    neg_deps[u].append(-dep)
+                    arrivals[u].append(merged)
+                    pointers[u].append(merged_ptr)
+
+        candidates = {}
+        for entry, pointer in zip(arrivals[source], pointers[source]):
+            for r in range(rides):
+                if entry[r] == inf or (r and entry[r - 1] <= entry[r]) or (pointer[r], r) in candidates:
+                    continue
+                dep = int(self.dep_time[pointer[r][0]])
+                if dep < depart_from or (depart_to is not None and dep > depart_to):
+                    continue
+                legs = self._profile_legs(target, *pointer[r], r, neg_deps, pointers)
+                # Criteria to minimise: later departure, earlier arrival, fewer transfers
+                criteria = (-dep, legs[-1][1], len(legs) - 1) if arrive_by is None else (-dep, len(legs) - 1)
+                candidates[(pointer[r], r)] = (criteria, legs)
+
+        front = pareto_front(candidates.values())
+        front.sort(key=lambda c: (-c[0][0], c[0][-1]))
+        return [self._legs_journey(legs) for _, legs in front]
+
+    def _profile_legs(self, target, board, alight, r, neg_deps, pointers):
+        """Follow profile pointers from a boarding connection to the target: [(board, alight)]"""
+        legs = [(board, alight)]
+        while int(self.arr_stop[alight]) != target:
+            v, r = int(self.arr_stop[alight]), r - 1
+            i = bisect_right(neg_deps[v], -(int(self.arr_time[alight]) + MIN_TRANSFER_MIN)) - 1
+            board, alight = pointers[v][i][r]
+            legs.append((board, alight))
+        return [(b, int(self.arr_time[a]), a) for b, a in legs]
+
+    def _legs_journey(self, rides):
+        """Journey dict for a list of (boarding, arrival minute, alighting) rides"""
+        legs = [self._leg(board, alight) for board, _, alight in rides]
+        depart, arrival = int(self.dep_time[rides[0][0]]), rides[-1][1]
+        return {
+            "departure_time": legs[0]['departure_time'],
+            "arrival_time": format_time(arrival),
+            "duration": arrival - depart,
+            "in_vehicle_time": sum(leg['duration'] for leg in legs),
+            "transfers": len(legs) - 1,
+            "legs": legs
+        }
+
+    def _journey(self, source, target, depart, arrival, reached_by):
+        """Walk back through reached_by and build one leg per vehicle ride"""
+        legs = []
+        stop = target
+        while stop != source:
+            board, alight = reached_by[stop]
+            legs.append(self._leg(board, alight))
+            stop = int(self.dep_stop[board])
+        legs.reverse()
+        return {
+            "departure_time": legs[0]['departure_time'] if legs else format_time(depart),
+            "arrival_time": format_time(arrival),
+            "requested_departure": format_time(depart),
+            "duration": arrival - depart,
+            "in_vehicle_time": sum(leg['duration'] for leg in legs),
+            "transfers": max(len(legs) - 1, 0),
+            "legs": legs
+        }
+
+    def _leg(self, board, alight):
+        """One vehicle ride from connection `board` to connection `alight`"""
+        trip = int(self.trip[board])
+        dep, arr = int(self.dep_time[board]), int(self.arr_time[alight])
+        return {
+            "route": self.index.routes[self.trip_routes[trip]],
+            "trip_start": format_time(self.trip_starts[trip]),
+            "from_station": self.index.stations.get(self.stop_ids[int(self.dep_stop[board])]),
+            "to_station": self.index.stations.get(self.stop_ids[int(self.arr_stop[alight])]),
+            "departure_time": format_time(dep),
+            "arrival_time": format_time(arr),
+            "duration": arr - dep,
+            "stops": int(self.hop[alight]) - int(self.hop[board]) + 1
+        }
+
+
+def pareto_front(candidates):
+    """(criteria, item) pairs not dominated by another; every criterion is minimised"""
+    candidates = sorted(candidates, key=lambda c: c[0])
+    front = []
+    for criteria, item in candidates:
+        # Sorted order: only an earlier candidate can dominate this one
+        if any(all(f <= c for f, c in zip(kept, criteria)) for kept, _ in front):
+            continue
+        front.append((criteria, item))
+    return front
+
+def load_schedules(db=None):
+    """Load all schedules from ArangoDB"""
+    db = db or db_connection.get_db()
+    return list(db.AQLQuery("FOR s IN schedules RETURN s", rawResults=True, batchSize=1000))
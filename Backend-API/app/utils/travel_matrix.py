@@ -0,0 +1,133 @@
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from app.config import Config
+from app.utils.station_graph import METRICS, dijkstra_costs, budget_bucket, load_graph_arrays
+
+# Below this many origins the inter-process hop costs more than it saves
+MIN_PARALLEL_ROWS = 8
+# Workers start from a clean forkserver, never forked from a request process
+# that already runs rebuild threads
+POOL_START_METHOD = 'forkserver'
+# Snapshot directories each worker keeps mapped (current version plus the previous one)
+WORKER_GRAPH_CACHE = 2
+
+# Graph arrays seeded by the pool initializer (graphs without a snapshot directory)
+_worker_csr = None
+# Snapshot directory -> CSR arrays mapped in this worker process
+_worker_graphs = OrderedDict()
+
+def _init_worker(csr):
+    """Pool initializer: keep (offsets, targets, weights) in the worker process"""
+    global _worker_csr
+    _worker_csr = csr
+
+def _resolve_csr(csr):
+    """CSR arrays for a task: passed in, mapped from a snapshot directory, or seeded"""
+    if csr is None:
+        return _worker_csr
+    if not isinstance(csr, str):
+        return csr
+    mapped = _worker_graphs.get(csr)
+    if mapped is None:
+        arrays = load_graph_arrays(csr)
+        mapped = _worker_graphs[csr] = (arrays['offsets'], arrays['targets'],
+                                        {metric: arrays[f'weights_{metric}'] for metric in METRICS})
+        while len(_worker_graphs) > WORKER_GRAPH_CACHE:
+            _worker_graphs.popitem(last=False)
+    else:
+        _worker_graphs.move_to_end(csr)
+    return mapped
+
+def _matrix_rows(sources, dest_nodes, metric, csr=None):
+    """One-to-many Dijkstra per source, returning one cost row per source"""
+    offsets, targets, weights = _resolve_csr(csr)
+    weights = weights[metric]
+    rows = []
+    for source in sources:
+        costs = dijkstra_costs(offsets, targets, weights, source, dest_nodes)
+        rows.append([costs.get(t) for t in dest_nodes])
+    return rows
+
+def _reachable_rows(sources, max_cost, csr=None):
+    """Bounded Dijkstra over duration per source, returning {node: minutes} per source"""
+    offsets, targets, weights = _resolve_csr(csr)
+    return [dijkstra_costs(offsets, targets, weights['duration'], source, max_cost=max_cost)
+            for source in sources]
+
+
+class TravelMatrixPool:
+    """Process pool for travel matrices and bulk isochrones.
+
+    Tasks name the shared snapshot directory of their graph and each worker
+    maps it on first use, so one pool serves every network version. Only a
+    graph without a snapshot directory (snapshots off or no Redis) needs a
+    pool seeded with its arrays, which is replaced when that graph changes.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(TravelMatrixPool, cls).__new__(cls)
+            cls._instance._pool = None
+            cls._instance._seeded = None
+            cls._instance._lock = threading.Lock()
+        return cls._instance
+
+    def _executor(self, graph):
+        """Get the pool, replacing it only when it must be seeded with another graph's arrays"""
+        seeded = None if graph.array_dir else graph
+        with self._lock:
+            if self._pool is None or self._seeded is not seeded:
+                if self._pool is not None:
+                    self._pool.shutdown(wait=False)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=Config.JOURNEY_MATRIX_WORKERS,
+                    mp_context=multiprocessing.get_context(POOL_START_METHOD),
+                    initializer=_init_worker,
+                    initargs=((graph.offsets, graph.targets, graph.weights) if seeded else None,)
+                )
+                self._seeded = seeded
+                print(f"🧮 Travel matrix pool started ({Config.JOURNEY_MATRIX_WORKERS} workers)")
+            return self._pool
+
+    def _run(self, graph, fn, sources, *args):
+        """Apply fn(sources_chunk, *args) over sources, in the pool when worth it"""
+        workers = Config.JOURNEY_MATRIX_WORKERS
+        # A stale graph whose snapshot directory is already gone is computed here:
+        # its arrays are still mapped in this process, but workers could not open them
+        gone = graph.array_dir is not None and not os.path.isdir(graph.array_dir)
+        if workers <= 1 or len(sources) < MIN_PARALLEL_ROWS or gone:
+            return fn(sources, *args, (graph.offsets, graph.targets, graph.weights))
+
+        pool = self._executor(graph)
+        chunk = max(1, -(-len(sources) // (workers * 4)))
+        chunks = [sources[i:i + chunk] for i in range(0, len(sources), chunk)]
+        args += (graph.array_dir,)
+        rows = []
+        for part in pool.map(fn, chunks, *[[arg] * len(chunks) for arg in args]):
+            rows.extend(part)
+        return rows
+
+    def compute(self, graph, sources, dest_nodes, metric='duration'):
+        """Cost matrix rows (None = unreachable) for node lists sources x dest_nodes"""
+        return self._run(graph, _matrix_rows, sources, dest_nodes, metric)
+
+    def reachable(self, graph, sources, budget):
+        """Bulk isochrones: {node: minutes} within budget for each source.
+
+        Cached (source, budget bucket) results are reused; the misses run in
+        the pool and are written back to the graph's cache.
+        """
+        bucket = budget_bucket(budget)
+        found = {s: graph.cached_reachable(s, bucket) for s in set(sources)}
+        missing = sorted(s for s, costs in found.items() if costs is None)
+        for source, costs in zip(missing, self._run(graph, _reachable_rows, missing, bucket)):
+            graph.cache_reachable(source, bucket, costs)
+            found[source] = costs
+        return [{u: c for u, c in found[s].items() if c <= budget} for s in sources]
+
+# Singleton instance
+travel_matrix = TravelMatrixPool()
@@ -2,7 +2,9 @@ from app import create_app
 from app.config import Config
 # venv\Scripts\activate  # Windows
 
-app = create_app('development')
+# Worker processes (forkserver/spawn) import this file again as __mp_main__: don't start a second app there
+if __name__ != '__mp_main__':
+    app = create_app('development')
 
 if __name__ == '__main__':
     app.run(
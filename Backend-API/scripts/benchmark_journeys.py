@@ -0,0 +1,169 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+# --- CẤU HÌNH ĐƯỜNG DẪN: chạy được từ bất kỳ thư mục nào ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import numpy as np
+from app.config import Config
+from app.utils.route_index import RouteIndex
+from app.utils.station_graph import StationGraph
+from scripts.synthetic_network import LAYOUTS, generate_network
+
+# Không build hub labels nền trong lúc đo (A* là đường 'auto' khi chưa có labels)
+Config.JOURNEY_HUB_LABELS = False
+
+DEFAULT_SIZES = (1000, 10000, 50000)
+ISOCHRONE_BUDGET_MIN = 30
+NEARBY_K = 10
+NEARBY_RADIUS_KM = 1
+
+
+def timed(fn, inputs):
+    """Run fn over inputs; latency summary in milliseconds plus the results"""
+    latencies, results = [], []
+    for args in inputs:
+        started = time.perf_counter()
+        results.append(fn(*args))
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies = np.asarray(latencies)
+    return {
+        "queries": len(latencies),
+        "mean_ms": round(float(latencies.mean()), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 4),
+        "max_ms": round(float(latencies.max()), 4)
+    }, results
+
+
+def benchmark_size(stations, layout, routes, stops_per_route, queries, seed):
+    """Generate one network and time every journey operation on it"""
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    network = generate_network(stations, routes, stops_per_route, layout, seed=seed)
+    generated = time.perf_counter() - started
+
+    started = time.perf_counter()
+    graph = StationGraph(network['stations'], network['connects'])
+    graph_built = time.perf_counter() - started
+    started = time.perf_counter()
+    index = RouteIndex(network['routes'], network['serves'], graph.stations)
+    index_built = time.perf_counter() - started
+    started = time.perf_counter()
+    graph.spatial_index
+    grid_built = time.perf_counter() - started
+
+    n = graph.node_count
+    pairs = [(rng.randrange(n), rng.randrange(n)) for _ in range(queries)]
+    results = {}
+    for algorithm in ('dijkstra', 'astar', 'bidirectional'):
+        summary, paths = timed(lambda s, t: graph.shortest_path(s, t, 'duration', algorithm), pairs)
+        found = [p for p in paths if p is not None]
+        summary["found"] = len(found)
+        summary["mean_expanded"] = round(sum(p['expanded'] for p in found) / len(found), 1) if found else 0
+        results[f"shortest_path_{algorithm}"] = summary
+
+    # Half the pairs share a route (hits), half are random (mostly misses)
+    codes = [s['station_id'] for s in graph.stations]
+    route_pairs = []
+    for i in range(queries):
+        if i % 2 == 0 and index.route_stops:
+            stops = index.route_stops[rng.choice(list(index.route_stops))]
+            a, b = sorted(rng.sample(range(len(stops)), 2))
+            route_pairs.append((index.stations[stops[a]['_to']]['station_id'],
+                                index.stations[stops[b]['_to']]['station_id']))
+        else:
+            route_pairs.append((rng.choice(codes), rng.choice(codes)))
+    summary, found = timed(index.routes_between, route_pairs)
+    summary["found"] = sum(1 for r in found if r)
+    results["routes_between"] = summary
+
+    points = [(float(graph.lat[u]) + rng.uniform(-0.005, 0.005), float(graph.lng[u]) + rng.uniform(-0.005, 0.005))
+              for u in (rng.randrange(n) for _ in range(queries))]
+    results["nearby_stations_k"], _ = timed(
+        lambda lat, lng: graph.spatial_index.nearest(lat, lng, NEARBY_K), points)
+    results["nearby_stations_radius"], _ = timed(
+        lambda lat, lng: graph.spatial_index.within(lat, lng, NEARBY_RADIUS_KM), points)
+
+    # Uncached bounded searches (the isochrone endpoint caches per budget bucket)
+    sources = [(rng.randrange(n),) for _ in range(queries)]
+    summary, reached = timed(
+        lambda s: graph.costs_from(s, 'duration', max_cost=ISOCHRONE_BUDGET_MIN), sources)
+    summary["mean_reached"] = round(sum(len(r) for r in reached) / len(reached), 1)
+    results["isochrone"] = summary
+
+    return {
+        "stations": n,
+        "layout": layout,
+        "routes": len(network['routes']),
+        "stops_per_route": stops_per_route,
+        "arcs": graph.arc_count,
+        "serves": len(network['serves']),
+        "build_s": {
+            "generate": round(generated, 4),
+            "graph": round(graph_built, 4),
+            "route_index": round(index_built, 4),
+            "spatial_index": round(grid_built, 4)
+        },
+        "benchmarks": results
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=parent_dir,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo hiệu năng journey engine trên mạng lưới tổng hợp (không cần ArangoDB)")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="Số trạm, cách nhau bởi dấu phẩy (mặc định 1000,10000,50000)")
+    parser.add_argument('--layout', choices=LAYOUTS, default='grid')
+    parser.add_argument('--routes', type=int, default=None, help="Số tuyến (mặc định: số trạm / 10)")
+    parser.add_argument('--stops-per-route', type=int, default=30)
+    parser.add_argument('--queries', type=int, default=100, help="Số truy vấn cho mỗi phép đo")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None, help="Ghi kết quả JSON ra file (mặc định: stdout)")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "queries": args.queries,
+            "seed": args.seed
+        },
+        "results": []
+    }
+    for size in (int(s) for s in args.sizes.split(',') if s.strip()):
+        print(f"⏱️  {size} trạm ({args.layout})...", file=sys.stderr)
+        result = benchmark_size(size, args.layout, args.routes, args.stops_per_route, args.queries, args.seed)
+        for name, summary in result['benchmarks'].items():
+            print(f"   {name:<28} p50 {summary['p50_ms']:>10.3f} ms   p95 {summary['p95_ms']:>10.3f} ms",
+                  file=sys.stderr)
+        report["results"].append(result)
+
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        print(f"💾 Đã ghi {args.output}", file=sys.stderr)
+    else:
+        print(payload)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+# --- CẤU HÌNH ĐƯỜNG DẪN: chạy được từ bất kỳ thư mục nào ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+os.chdir(parent_dir)
+
+from app.config import Config
+from app.utils.hub_labels import build_hub_labels, label_base
+from app.utils.station_graph import METRICS, load_graph_arrays, load_station_graph
+
+def build_all():
+    """Tính sẵn hub labels cho graph hiện tại (chạy trước khi deploy để API không phải build nền)"""
+    graph = load_station_graph()
+    print(f"🕸️  Graph: {graph.node_count} trạm, {graph.arc_count} cạnh, fingerprint {graph.fingerprint[:16]}")
+    os.makedirs(Config.JOURNEY_HUB_LABEL_DIR, exist_ok=True)
+
+    for metric in Config.JOURNEY_HUB_LABEL_METRICS:
+        base = label_base(graph, metric)
+        if os.path.exists(f"{base}-meta.json"):
+            print(f"✅ {metric}: đã có {base}, bỏ qua")
+            continue
+        started = time.perf_counter()
+        labels = build_hub_labels(graph, metric)
+        labels.save(base)
+        print(f"🏷️  {metric}: {labels.entry_count} entries "
+              f"({labels.entry_count / max(graph.node_count, 1):.1f}/trạm) trong {time.perf_counter() - started:.1f}s")
+
+def build_from_arrays(graph_dir, fingerprint, metric, output, directed=False):
+    """Build one metric's labels from graph arrays on disk (the API's background build runs this)"""
+    arrays = load_graph_arrays(graph_dir)
+    graph = SimpleNamespace(
+        node_count=len(arrays['offsets']) - 1,
+        directed=directed,
+        fingerprint=fingerprint,
+        offsets=arrays['offsets'],
+        targets=arrays['targets'],
+        arc_edges=arrays['arc_edges'],
+        arc_count=len(arrays['targets']),
+        rev_offsets=arrays['rev_offsets'],
+        rev_sources=arrays['rev_sources'],
+        rev_arcs=arrays['rev_arcs'],
+        weights={m: arrays[f'weights_{m}'] for m in METRICS}
+    )
+    build_hub_labels(graph, metric).save(output)
+
+def main():
+    parser = argparse.ArgumentParser(description="Tính sẵn hub labels (mặc định: graph hiện tại trong ArangoDB)")
+    parser.add_argument('--graph-dir', default=None, help="Thư mục graph arrays (.npy) thay vì đọc ArangoDB")
+    parser.add_argument('--fingerprint', default=None, help="Fingerprint của graph trong --graph-dir")
+    parser.add_argument('--metric', choices=METRICS, default='duration')
+    parser.add_argument('--output', default=None, help="Tiền tố file labels (label_base của graph)")
+    parser.add_argument('--directed', action='store_true')
+    args = parser.parse_args()
+
+    if args.graph_dir is None:
+        build_all()
+        return
+    if not args.fingerprint or not args.output:
+        parser.error("--graph-dir cần --fingerprint và --output")
+    build_from_arrays(args.graph_dir, args.fingerprint, args.metric, args.output, args.directed)
+
+if __name__ == '__main__':
+    main()
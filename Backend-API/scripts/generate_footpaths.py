@@ -0,0 +1,23 @@
+import os
+import sys
+
+# --- CẤU HÌNH ĐƯỜNG DẪN: chạy được từ bất kỳ thư mục nào ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from app.config import Config
+from app.utils.footpaths import rebuild_footpaths
+from app.utils.network import network
+
+if __name__ == '__main__':
+    # Bán kính (km) có thể truyền qua tham số: python scripts/generate_footpaths.py 0.5
+    radius = float(sys.argv[1]) if len(sys.argv) > 1 else Config.JOURNEY_FOOTPATH_RADIUS_KM
+    print(f"🚶 Sinh cạnh đi bộ giữa các trạm trong bán kính {radius} km...")
+    removed, inserted = rebuild_footpaths(radius_km=radius)
+    print(f"   🗑️  Đã xóa {removed} cạnh đi bộ cũ")
+    direction = "mỗi chiều một cạnh" if Config.JOURNEY_DIRECTED_EDGES else "một cạnh mỗi cặp, graph tự lấy hai chiều"
+    print(f"   ✅ Đã thêm {inserted} cạnh đi bộ ({direction})")
+    # Báo cho các worker API đang chạy dựng lại network (chỉ cần Redis)
+    network.invalidate()
+    print("   🔄 Đã tăng network version, API sẽ dùng cạnh đi bộ mới")
@@ -0,0 +1,159 @@
+import math
+import random
+
+# Trung tâm TP.HCM (Chợ Bến Thành)
+CENTER = (10.7725, 106.6980)
+KM_PER_DEGREE = 111.32
+LAYOUTS = ('grid', 'radial')
+# Bus speed and dwell time used for connects.duration / serves.arrival_offset
+BUS_SPEED_KMH = 20
+DWELL_MIN = 0.5
+
+
+def _grid_positions(n):
+    """Square grid: node -> (x, y) in spacing units, and lattice neighbours"""
+    side = math.ceil(math.sqrt(n))
+    positions = [(i % side - side / 2, i // side - side / 2) for i in range(n)]
+
+    def neighbors(i):
+        r, c = divmod(i, side)
+        for dr, dc in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+            rr, cc = r + dr, c + dc
+            j = rr * side + cc
+            if 0 <= rr and 0 <= cc < side and j < n:
+                yield j, (dr, dc)
+    return positions, neighbors
+
+def _radial_positions(n):
+    """Rings around the centre crossed by spokes; spoke count keeps outer rings about one spacing apart"""
+    spokes = max(4, round(math.sqrt(2 * math.pi * n)))
+    rings = math.ceil(n / spokes)
+    positions = []
+    for i in range(n):
+        ring, spoke = divmod(i, spokes)
+        angle = 2 * math.pi * spoke / spokes
+        positions.append(((ring + 1) * math.cos(angle), (ring + 1) * math.sin(angle)))
+
+    def neighbors(i):
+        ring, spoke = divmod(i, spokes)
+        for dr, ds in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            rr = ring + dr
+            j = rr * spokes + (spoke + ds) % spokes
+            if 0 <= rr < rings and j < n:
+                yield j, (dr, ds)
+    return positions, neighbors
+
+
+def generate_network(stations=1000, routes=None, stops_per_route=30, layout='grid',
+                     spacing_km=0.3, seed=42):
+    """Synthetic city network as ArangoDB-shaped documents.
+
+    Returns {'stations', 'connects', 'routes', 'serves', 'schedules'} in the
+    same shape as scripts/insert_full_data.py, so it can be fed to
+    StationGraph / RouteIndex (or inserted into a test database). Routes are
+    random walks over the layout's lattice that prefer to keep going
+    straight; consecutive stops become `connects` edges.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"layout must be one of {list(LAYOUTS)}")
+    rng = random.Random(seed)
+    routes = routes or max(10, stations // 10)
+    positions, neighbors = (_grid_positions if layout == 'grid' else _radial_positions)(stations)
+
+    lat0, lng0 = CENTER
+    deg_lat = spacing_km / KM_PER_DEGREE
+    deg_lng = spacing_km / (KM_PER_DEGREE * math.cos(math.radians(lat0)))
+    station_docs = []
+    for i, (x, y) in enumerate(positions):
+        # Jitter so no two stations share a latitude/longitude line exactly
+        x += rng.uniform(-0.2, 0.2)
+        y += rng.uniform(-0.2, 0.2)
+        station_docs.append({
+            "_key": f"SYN{i:06d}",
+            "_id": f"stations/SYN{i:06d}",
+            "station_id": f"SYN{i:06d}",
+            "name": f"Trạm {i}",
+            "location": {"latitude": lat0 + y * deg_lat, "longitude": lng0 + x * deg_lng},
+            "type": "terminal" if i % 97 == 0 else "stop",
+            "status": "maintenance" if rng.random() < 0.02 else "active",
+            "capacity": rng.choice([10, 20, 30, 50]),
+            "facilities": {
+                "waiting_area": rng.random() < 0.7,
+                "wifi": rng.random() < 0.3,
+                "toilet": rng.random() < 0.2,
+                "atm": rng.random() < 0.1,
+                "wheelchair_accessible": rng.random() < 0.5
+            }
+        })
+
+    def leg(a, b):
+        """(distance m, duration min) between two stations"""
+        la, lb = station_docs[a]['location'], station_docs[b]['location']
+        dy = (la['latitude'] - lb['latitude']) * KM_PER_DEGREE
+        dx = (la['longitude'] - lb['longitude']) * KM_PER_DEGREE * math.cos(math.radians(lat0))
+        km = math.hypot(dx, dy)
+        return round(km * 1000), round(km / BUS_SPEED_KMH * 60 + DWELL_MIN, 2)
+
+    route_docs, serves, connects = [], [], {}
+    for r in range(routes):
+        node = rng.randrange(stations)
+        heading = None
+        path = [node]
+        seen = {node}
+        while len(path) < stops_per_route:
+            options = [(j, d) for j, d in neighbors(node) if j not in seen]
+            if not options:
+                break
+            straight = [o for o in options if o[1] == heading]
+            node, heading = straight[0] if straight and rng.random() < 0.8 else rng.choice(options)
+            path.append(node)
+            seen.add(node)
+        if len(path) < 2:
+            continue
+
+        fare = rng.choice([5000, 6000, 7000, 10000])
+        route_id = f"SR{r:05d}"
+        route_docs.append({
+            "_key": route_id,
+            "_id": f"routes/{route_id}",
+            "route_id": route_id,
+            "route_code": str(r),
+            "route_name": f"Tuyến {r}",
+            "type": "normal",
+            "direction": "two-way",
+            "operating_hours": {"start": "05:00", "end": "22:00"},
+            "frequency": rng.choice([5, 10, 15, 20, 30]),
+            "fare": {"adult": fare, "student": fare // 2, "senior": fare // 2},
+            "operator": "SYNTHETIC",
+            "status": "active"
+        })
+        offset = 0.0
+        for order, (a, b) in enumerate(zip([None] + path, path), start=1):
+            if a is not None:
+                distance, duration = leg(a, b)
+                offset += duration
+                connects.setdefault((a, b), {
+                    "_from": f"stations/SYN{a:06d}",
+                    "_to": f"stations/SYN{b:06d}",
+                    "distance": distance,
+                    "duration": duration,
+                    "road_condition": "good"
+                })
+            serves.append({
+                "_from": f"routes/{route_id}",
+                "_to": f"stations/SYN{b:06d}",
+                "stop_order": order,
+                "arrival_offset": round(offset),
+                "is_main_stop": order == 1 or order == len(path)
+            })
+
+    connect_docs = []
+    for k, edge in enumerate(connects.values()):
+        connect_docs.append({"_key": f"SC{k:07d}", **edge})
+    return {
+        "stations": station_docs,
+        "connects": connect_docs,
+        "routes": route_docs,
+        "serves": serves,
+        "schedules": []
+    }
@@ -77,6 +77,7 @@ export default function JourneyPage() {
       const response = await api.findShortestPath({
         from_station_id: fromStation,
         to_station_id: toStation,
+        alternatives: 3,
       });
 
       if (response.success && response.data && response.data.length > 0) {
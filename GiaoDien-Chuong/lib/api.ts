@@ -166,7 +166,16 @@ class ApiClient {
   }
 
   // Journey
-  async findShortestPath(data: { from_station_id: string; to_station_id: string }) {
+  async findShortestPath(data: {
+    from_station_id: string;
+    to_station_id: string;
+    metric?: 'duration' | 'distance';
+    alternatives?: number;
+    transfer_penalty?: number;
+    wheelchair_accessible_only?: boolean;
+    required_facilities?: string[];
+    avoid_status?: string[];
+  }) {
     const response = await this.client.post('/journey/shortest-path', data);
     return response.data;
   }
@@ -176,6 +185,18 @@ class ApiClient {
     return response.data;
   }
 
+  async planJourney(data: {
+    origin: { latitude: number; longitude: number };
+    destination: { latitude: number; longitude: number };
+    metric?: 'duration' | 'distance';
+    k?: number;
+    walk_radius?: number;
+    transfer_penalty?: number;
+  }) {
+    const response = await this.client.post('/journey/plan', data);
+    return response.data;
+  }
+
   async findNearbyStations(params: { latitude: number; longitude: number; radius?: number }) {
     const response = await this.client.get('/journey/nearby-stations', { params });
     return response.data;
@@ -184,6 +184,7 @@ export interface Schedule {
 
 // Enhanced Journey Types
 export interface RouteSegment {
+  mode?: 'bus' | 'walk';
   route: BusRoute;
   from_station: Station;
   to_station: Station;